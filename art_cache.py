@@ -0,0 +1,145 @@
+import os
+import time
+import hashlib
+import threading
+import magic
+from http_session import get_http_session
+from storage import cache_dir, connect_sqlite, shared_instance
+
+art_cache_dir = os.path.join(cache_dir(), "art")
+
+
+class ArtCache:
+    """
+    Content-addressed cache of downloaded album art.
+
+    Each URL maps to the SHA-256 of the bytes it served; the bytes are stored
+    once per hash on disk together with their sniffed MIME type, so every
+    track of an album (and every album sharing a cover) reuses one download.
+    The least recently used images are evicted past max_bytes. Concurrent
+    requests for the same URL wait on a single download.
+    """
+
+    def __init__(self, cache_dir=art_cache_dir, max_bytes=500 * 1024 * 1024, timeout=15):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.sqlite")
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+        self.in_flight = {}  # url -> threading.Event set when its download finishes
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS art_urls (
+                    url TEXT PRIMARY KEY,
+                    content_hash TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS art_blobs (
+                    content_hash TEXT PRIMARY KEY,
+                    mime TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+
+    def connect(self):
+        return connect_sqlite(self.index_path)
+
+    def blob_path(self, content_hash):
+        return os.path.join(self.cache_dir, content_hash)
+
+    def fetch(self, url):
+        """Returns (image_bytes, mime_type) for the URL, or (None, None) if it can't be fetched."""
+        cached = self.lookup(url)
+        if cached[0] is not None:
+            return cached
+
+        with self.lock:
+            event = self.in_flight.get(url)
+            if event is None:
+                event = threading.Event()
+                self.in_flight[url] = event
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            # Someone else is downloading this URL; use their result once it lands (None if theirs failed)
+            event.wait()
+            return self.lookup(url)
+
+        try:
+            return self.download(url)
+        finally:
+            with self.lock:
+                del self.in_flight[url]
+            event.set()
+
+    def lookup(self, url):
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT b.content_hash, b.mime FROM art_urls u JOIN art_blobs b ON b.content_hash = u.content_hash "
+                "WHERE u.url = ?", (url,)
+            ).fetchone()
+            if not row:
+                return None, None
+
+            try:
+                with open(self.blob_path(row[0]), "rb") as blob:
+                    data = blob.read()
+            except FileNotFoundError:
+                conn.execute("DELETE FROM art_blobs WHERE content_hash = ?", (row[0],))
+                return None, None
+
+            conn.execute("UPDATE art_blobs SET last_used = ? WHERE content_hash = ?", (time.time(), row[0]))
+            return data, row[1]
+
+    def download(self, url):
+        response = get_http_session().get(url, timeout=self.timeout)
+        if response.status_code != 200:
+            print(f"Failed to download album art: {response.status_code}")
+            return None, None
+
+        data = response.content
+        content_hash = hashlib.sha256(data).hexdigest()
+        mime_type = magic.Magic(mime=True).from_buffer(data[:2048])
+
+        path = self.blob_path(content_hash)
+        if not os.path.exists(path):
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as blob:
+                blob.write(data)
+            os.replace(temp_path, path)
+
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO art_blobs (content_hash, mime, size, last_used) VALUES (?, ?, ?, ?)",
+                (content_hash, mime_type, len(data), time.time())
+            )
+            conn.execute("INSERT OR REPLACE INTO art_urls (url, content_hash) VALUES (?, ?)", (url, content_hash))
+            self.evict(conn)
+
+        return data, mime_type
+
+    def evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM art_blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for content_hash, size in conn.execute("SELECT content_hash, size FROM art_blobs ORDER BY last_used ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM art_blobs WHERE content_hash = ?", (content_hash,))
+            conn.execute("DELETE FROM art_urls WHERE content_hash = ?", (content_hash,))
+            try:
+                os.remove(self.blob_path(content_hash))
+            except OSError:
+                pass
+            total -= size
+
+
+get_art_cache = shared_instance(ArtCache)
@@ -0,0 +1,107 @@
+import os
+import re
+import time
+import yt_dlp
+from concurrent.futures import ThreadPoolExecutor
+from storage import cache_dir, connect_sqlite, shared_instance
+
+browse_cache_path = os.path.join(cache_dir(), "browse_urls.sqlite")
+
+
+def parse_browse_id(url):
+    match = re.search(r'/browse/([\w-]+)', url or "")
+    return match.group(1) if match else None
+
+
+def playlist_url(playlist_id):
+    return f"https://music.youtube.com/playlist?list={playlist_id}"
+
+
+def extract_browse_target(url):
+    """
+    Asks yt-dlp's YouTube Music extractor where a browse page (e.g. an album's
+    MPREb_... page) leads, without processing its entries.
+    Returns the playlist URL, or None if it couldn't be resolved.
+    """
+    ydl_opts = {'quiet': True, 'skip_download': True, 'extract_flat': True}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        result = ydl.extract_info(url, download=False, process=False)
+
+    if result.get('_type') in ('url', 'url_transparent') and result.get('url'):
+        return result['url']
+
+    playlist_id = result.get('id') or ""
+    if playlist_id.startswith(('OLAK5uy_', 'PL', 'RD')):
+        return playlist_url(playlist_id)
+    return result.get('webpage_url')
+
+
+class BrowseResolver:
+    """
+    Expands YouTube Music browse links to the playlist URLs they redirect to.
+
+    Browse IDs always lead to the same playlist, so results are kept in a
+    SQLite cache for good. resolve_all() resolves a whole batch of links at
+    once on a thread pool, before any of them is queued for download.
+    """
+
+    def __init__(self, path=browse_cache_path, workers=8):
+        self.path = path
+        self.workers = workers
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS browse_urls (
+                    browse_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def connect(self):
+        return connect_sqlite(self.path)
+
+    def cached(self, browse_id):
+        with self.connect() as conn:
+            row = conn.execute("SELECT url FROM browse_urls WHERE browse_id = ?", (browse_id,)).fetchone()
+        return row[0] if row else None
+
+    def resolve(self, url):
+        """The URL a browse link leads to; any other URL, or one that can't be resolved, is returned as-is."""
+        browse_id = parse_browse_id(url)
+        if not browse_id:
+            return url
+
+        cached = self.cached(browse_id)
+        if cached:
+            return cached
+
+        print(f"Detected 'browse' in URL: {url}")
+        try:
+            target = extract_browse_target(url)
+        except (yt_dlp.utils.ExtractorError, yt_dlp.utils.DownloadError) as e:
+            print(f"❌ Could not resolve browse URL {url}: {e}")
+            return url
+
+        if not target:
+            print(f"❌ Could not resolve browse URL {url}")
+            return url
+
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO browse_urls (browse_id, url, created_at) VALUES (?, ?, ?)",
+                (browse_id, target, time.time())
+            )
+        print(f"Resolved {url} -> {target}")
+        return target
+
+    def resolve_all(self, urls):
+        """Resolves a batch of links concurrently, keeping their order."""
+        if not any(parse_browse_id(url) for url in urls):
+            return list(urls)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self.resolve, urls))
+
+
+get_browse_resolver = shared_instance(BrowseResolver)
@@ -9,7 +9,9 @@ openai_api_key = config["openai_credentials"]["api_key"]
 organization = config["openai_credentials"].get("organization")
 project_id = config["openai_credentials"].get("project_id")
 
-from openai import OpenAI
+from openai import OpenAI, RateLimitError
+from gpt_cache import GPTMetadataCache
+from rate_limiter import get_rate_limiter, parse_retry_after
 
 client = OpenAI(
     api_key=openai_api_key,
@@ -18,64 +20,99 @@ client = OpenAI(
 )
 
 
-def get_all_metadata(input_metadata: dict, model="gpt-4o") -> dict:
+def create_completion(max_retries=3, **kwargs):
+    """client.chat.completions.create through the shared OpenAI rate limiter, backing off on 429s."""
+    limiter = get_rate_limiter("openai")
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            return client.chat.completions.create(**kwargs)
+        except RateLimitError as e:
+            if attempt == max_retries:
+                raise
+            limiter.block(parse_retry_after(e.response.headers.get("retry-after"), default=2 ** attempt))
+
+
+# Cache of earlier answers, so re-running a playlist or re-tagging doesn't pay for the same song twice
+gpt_cache_config = config.get("gpt_cache", {})
+gpt_cache_enabled = gpt_cache_config.get("enabled", True)
+gpt_cache = GPTMetadataCache(
+    ttl_seconds=gpt_cache_config.get("ttl_days", 90) * 24 * 3600,
+    max_entries=gpt_cache_config.get("max_entries", 50000)
+)
+
+
+# Fields the model fills for a single song
+song_required_fields = [
+    "title", "subtitle", "rating", "comments", "contributing_artist",
+    "album_artist", "album", "year", "track_number", "genre", "length",
+    "bit_rate", "publisher", "encoded_by", "author_url", "copyright",
+    "parental_rating_reason", "composers", "conductors", "group_description",
+    "mood", "part_of_set", "initial_key", "beats_per_minute_bpm", "protected",
+    "part_of_compilation", "disc_number", "isrc", "album_art_url"
+]
+
+song_properties = {
+    "title": {"type": "string"},
+    "subtitle": {"type": "string"},
+    "rating": {"type": "number"},
+    "comments": {"type": "string"},
+    "contributing_artist": {"type": "string"},
+    "album_artist": {"type": "string"},
+    "album": {"type": "string"},
+    "year": {"type": "integer"},
+    "track_number": {"type": "integer"},
+    "disc_number": {"type": "integer"},
+    "isrc": {"type": "string"},
+    "spotify_url": { "type": "string" },
+    "spotify_album_art_url": { "type": "string" },
+    "genre": {"type": "string"},
+    "length": {"type": "string"},
+    "bit_rate": {"type": "number"},
+    "publisher": {"type": "string"},
+    "encoded_by": {"type": "string"},
+    "author_url": {"type": "string"},
+    "copyright": {"type": "string"},
+    "parental_rating_reason": {"type": "string"},
+    "composers": {
+        "type": "array",
+        "items": {"type": "string"}
+    },
+    "conductors": {
+        "type": "array",
+        "items": {"type": "string"}
+    },
+    "group_description": {"type": "string"},
+    "mood": {"type": "string"},
+    "part_of_set": {"type": "string"},
+    "initial_key": {"type": "string"},
+    "beats_per_minute_bpm": {"type": "number"},
+    "protected": {"type": "boolean"},
+    "part_of_compilation": {"type": "boolean"}
+}
+
+
+def get_all_metadata(input_metadata: dict, model="gpt-4o", use_cache=True) -> dict:
+    use_cache = use_cache and gpt_cache_enabled
+    if use_cache:
+        cached = gpt_cache.get(input_metadata, model)
+        if cached is not None:
+            print(f"GPT metadata cache hit ({gpt_cache.stats()})")
+            return cached
+
     function_schema = {
         "name": "fill_song_metadata",
         "description": "Fill in the missing or incorrect metadata for the song details",
         "parameters": {
             "type": "object",
-            "required": [
-                "title", "subtitle", "rating", "comments", "contributing_artist",
-                "album_artist", "album", "year", "track_number", "genre", "length",
-                "bit_rate", "publisher", "encoded_by", "author_url", "copyright",
-                "parental_rating_reason", "composers", "conductors", "group_description",
-                "mood", "part_of_set", "initial_key", "beats_per_minute_bpm", "protected",
-                "part_of_compilation", "disc_number", "isrc", "album_art_url"
-            ],
-            "properties": {
-                "title": {"type": "string"},
-                "subtitle": {"type": "string"},
-                "rating": {"type": "number"},
-                "comments": {"type": "string"},
-                "contributing_artist": {"type": "string"},
-                "album_artist": {"type": "string"},
-                "album": {"type": "string"},
-                "year": {"type": "integer"},
-                "track_number": {"type": "integer"},
-                "disc_number": {"type": "integer"},
-                "isrc": {"type": "string"},
-                "spotify_url": { "type": "string" },
-                "spotify_album_art_url": { "type": "string" },
-                "genre": {"type": "string"},
-                "length": {"type": "string"},
-                "bit_rate": {"type": "number"},
-                "publisher": {"type": "string"},
-                "encoded_by": {"type": "string"},
-                "author_url": {"type": "string"},
-                "copyright": {"type": "string"},
-                "parental_rating_reason": {"type": "string"},
-                "composers": {
-                    "type": "array",
-                    "items": {"type": "string"}
-                },
-                "conductors": {
-                    "type": "array",
-                    "items": {"type": "string"}
-                },
-                "group_description": {"type": "string"},
-                "mood": {"type": "string"},
-                "part_of_set": {"type": "string"},
-                "initial_key": {"type": "string"},
-                "beats_per_minute_bpm": {"type": "number"},
-                "protected": {"type": "boolean"},
-                "part_of_compilation": {"type": "boolean"}
-            },
+            "required": song_required_fields,
+            "properties": song_properties,
             "additionalProperties": False
         }
     }
 
     try:
-        response = client.chat.completions.create(
+        response = create_completion(
             model=model,
             messages=[
                 {"role": "system", "content": "You are a music metadata assistant."},
@@ -87,12 +124,93 @@ def get_all_metadata(input_metadata: dict, model="gpt-4o") -> dict:
         )
 
         args_str = response.choices[0].message.function_call.arguments
-        return json.loads(args_str)
+        metadata = json.loads(args_str)
+        if use_cache:
+            gpt_cache.put(input_metadata, model, metadata)
+        return metadata
 
     except Exception as e:
         print("Error in get_all_metadata:", e)
         return {"error": str(e)}
 
+
+
+# Fields that are the same for every song on an album, asked for once per batch
+album_fields = ["album_artist", "album", "year", "genre", "publisher", "copyright", "part_of_compilation"]
+
+
+def get_album_metadata(tracks_metadata: list, model="gpt-4o", use_cache=True):
+    """
+    Fills the metadata of every track on one album with a single request.
+    Returns {"album": shared album fields, "tracks": one merged dict per input, in order},
+    or None if the batch failed, in which case callers should fall back to get_all_metadata.
+    Each track's result is also cached, so later get_all_metadata calls for it are cache hits.
+    """
+    use_cache = use_cache and gpt_cache_enabled
+
+    track_properties = {k: v for k, v in song_properties.items() if k not in album_fields}
+    track_properties["index"] = {"type": "integer"}
+    function_schema = {
+        "name": "fill_album_metadata",
+        "description": "Fill in the missing or incorrect metadata for every song on one album",
+        "parameters": {
+            "type": "object",
+            "required": ["album", "tracks"],
+            "properties": {
+                "album": {
+                    "type": "object",
+                    "required": album_fields,
+                    "properties": {k: song_properties[k] for k in album_fields}
+                },
+                "tracks": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "required": ["index"] + [f for f in song_required_fields if f in track_properties],
+                        "properties": track_properties
+                    }
+                }
+            },
+            "additionalProperties": False
+        }
+    }
+
+    indexed_tracks = [dict(track, index=i) for i, track in enumerate(tracks_metadata)]
+
+    try:
+        response = create_completion(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a music metadata assistant."},
+                {"role": "user", "content": "These songs are all from the same album. Fill in the shared album fields once, "
+                                            "then any missing or incorrect fields for each song, keeping each song's index:"},
+                {"role": "user", "content": json.dumps(indexed_tracks)}
+            ],
+            functions=[function_schema],
+            function_call={"name": "fill_album_metadata"}
+        )
+
+        args = json.loads(response.choices[0].message.function_call.arguments)
+        shared = args.get("album", {})
+        by_index = {track.get("index"): track for track in args.get("tracks", [])}
+
+        if any(i not in by_index for i in range(len(tracks_metadata))):
+            print("Album metadata batch came back incomplete, falling back to per-song requests.")
+            return None
+
+        merged_tracks = []
+        for i, input_metadata in enumerate(tracks_metadata):
+            merged = dict(shared)
+            merged.update({k: v for k, v in by_index[i].items() if k != "index"})
+            merged_tracks.append(merged)
+            if use_cache:
+                gpt_cache.put(input_metadata, model, merged)
+
+        return {"album": shared, "tracks": merged_tracks}
+
+    except Exception as e:
+        print("Error in get_album_metadata:", e)
+        return None
     
 # test_metadata = {
 #     "title": "Aquemini",
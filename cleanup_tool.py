@@ -1,11 +1,7 @@
 import os
-import hashlib
 from collections import defaultdict, Counter
-from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, APIC, error, ID3NoHeaderError
-
-def hash_image(image_data):
-    return hashlib.sha256(image_data).hexdigest()
+from library_index import get_library_index
 
 def extract_album_art(file_path):
     try:
@@ -44,16 +40,32 @@ def set_album_art(file_path, image_data, mime='image/jpeg', desc='Cover', verbos
     except Exception as e:
         print(f"❌ Error updating {file_path}: {e}")
 
+def scan_art_hashes(files):
+    """
+    Maps each file to the hash of its album art (None if it has none).
+    The library index hashes the art from the same tag read it takes the other
+    fields from, on a thread pool, so only files changed since the last
+    refresh are read here.
+    """
+    index = get_library_index()
+    entries = index.current_entries(files)
+    stale = [path for path in files if path not in entries]
+    if stale:
+        index.update_files(stale)
+        entries.update(index.current_entries(stale))
+    return {path: entry['art_hash'] for path, entry in entries.items()}
+
+def image_mime(image_data):
+    return 'image/png' if image_data.startswith(b'\x89PNG') else 'image/jpeg'
+
 def process_album(files):
     art_map = defaultdict(list)
-    art_data_map = {}
+    hashes = scan_art_hashes(files)
 
     for file in files:
-        image_data = extract_album_art(file)
-        if image_data:
-            h = hash_image(image_data)
+        h = hashes.get(file)
+        if h:
             art_map[h].append(file)
-            art_data_map[h] = image_data
 
     if not art_map:
         print("No album art found in this album.")
@@ -65,39 +77,48 @@ def process_album(files):
     common_candidates = [k for k, v in counts.items() if v == most_common]
 
     # Tie-breaking: use the first song's art
-    if len(common_candidates) > 1:
-        first_file = files[0]
-        first_art = extract_album_art(first_file)
-        chosen_hash = hash_image(first_art)
-        chosen_data = first_art
+    if len(common_candidates) > 1 and hashes.get(files[0]):
+        chosen_hash = hashes[files[0]]
     else:
         chosen_hash = common_candidates[0]
-        chosen_data = art_data_map[chosen_hash]
 
-    # Rewrite inconsistent album art
-    for h, file_list in art_map.items():
-        if h != chosen_hash:
-            for file in file_list:
-                set_album_art(file, chosen_data)
+    # Files already holding the chosen art are left alone
+    to_rewrite = [file for h, file_list in art_map.items() if h != chosen_hash for file in file_list]
+    if not to_rewrite:
+        return
+
+    # Read the chosen image once and write it to every mismatching file
+    chosen_data = extract_album_art(art_map[chosen_hash][0])
+    if not chosen_data:
+        print("❌ Could not read the chosen album art.")
+        return
+
+    mime = image_mime(chosen_data)
+    for file in to_rewrite:
+        set_album_art(file, chosen_data, mime=mime)
+
+    get_library_index().update_files(to_rewrite)
 
-def find_albums(folder):
+def find_albums(folder, entries=None):
+    # Album tags come from the library index instead of re-reading every file
+    if entries is None:
+        entries = get_library_index().files(folder, recursive=True)
     albums = defaultdict(list)
-    for root, _, files in os.walk(folder):
-        for file in files:
-            if file.lower().endswith(".mp3"):
-                full_path = os.path.join(root, file)
-                try:
-                    audio = MP3(full_path)
-                    album = audio.get("TALB")
-                    if album:
-                        album_name = str(album)
-                        albums[album_name].append(full_path)
-                except Exception as e:
-                    print(f"Skipping {file}: {e}")
+    for entry in entries:
+        if entry['album']:
+            albums[entry['album']].append(entry['path'])
     return albums
 
-def cleanup_main(folder):
-    albums = find_albums(folder)
+def cleanup_main(folder, files=None, entries=None):
+    """
+    Checks album art consistency for every album, or only the albums of `files` if given.
+    entries are the folder's index rows if the caller already has them.
+    """
+    albums = find_albums(folder, entries)
+    if files is not None:
+        files = {os.path.abspath(path) for path in files}
+        albums = {album: album_files for album, album_files in albums.items()
+                  if any(path in files for path in album_files)}
     print(f"Found {len(albums)} album(s).")
     for album, files in albums.items():
         print(f"\nProcessing album: {album}")
@@ -0,0 +1,471 @@
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import yt_dlp
+from download_song import extract_track_info, describe_track, download_audio, transcode_to_mp3, update_cookies, parse_video_id, is_network_error
+from download_metadata import get_enricher, music_path
+from job_journal import get_job_journal, reached, trim_info_dict
+from library_index import get_library_index
+from resolution_cache import get_resolution_cache
+from spotify_youtube_resolver import parse_spotify_track_id
+from pipeline import Pipeline, Stage
+from proxy_pool import get_proxy_pool
+from rate_limiter import rate_limit_stats
+from storage import app_data_dir
+
+# Every job gets its own folder under here while it downloads
+work_root = os.path.join(app_data_dir(), "downloads")
+
+# Tk widgets may only be touched from the GUI thread, so workers queue their
+# updates here and main.py drains the queue from the Tk event loop.
+ui_updates = queue.Queue()
+
+
+# Sessions that are still running, so the GUI can shut them down when its window closes
+active_sessions = set()
+active_sessions_lock = threading.Lock()
+
+
+def cancel_active_sessions():
+    """Cancels every running session, waiting for the tracks in flight to finish."""
+    with active_sessions_lock:
+        sessions = list(active_sessions)
+    for session in sessions:
+        session.cancel()
+
+
+def run_on_ui(callback):
+    ui_updates.put(callback)
+
+
+def drain_ui_updates():
+    """Run every queued widget update. Must be called from the Tk thread."""
+    while not ui_updates.empty():
+        callback = ui_updates.get()
+        try:
+            callback()
+        except Exception as e:
+            print(f"Error updating progress: {e}")
+
+
+class ProgressReporter:
+    """Counts finished tracks across worker threads and mirrors the count onto the GUI."""
+
+    def __init__(self, progress_bar, progress_label, total):
+        self.progress_bar = progress_bar
+        self.progress_label = progress_label
+        self.total = total
+        self.started = 0
+        self.completed = 0
+        self.lock = threading.Lock()
+
+    def add_tracks(self, count):
+        with self.lock:
+            self.total += count
+
+    def track_started(self):
+        with self.lock:
+            self.started += 1
+            started = self.started
+            total = self.total
+        run_on_ui(lambda: self.progress_label.config(text=f"Song: {started} / {total}"))
+
+    def track_finished(self):
+        with self.lock:
+            self.completed += 1
+            completed = self.completed
+            total = self.total
+        run_on_ui(lambda: self.set_progress(completed, total))
+
+    def set_progress(self, completed, total):
+        self.progress_bar['value'] = (completed / total) * 100
+
+
+# What to do with a track the library already has: skip it, replace the old file, or keep both
+duplicate_policies = ["skip", "replace", "keep-both"]
+
+
+def known_isrc(spotify_url):
+    """The ISRC of a Spotify track we resolved before, if any."""
+    track_id = parse_spotify_track_id(spotify_url)
+    cached = get_resolution_cache().get(track_id) if track_id else None
+    return cached['isrc'] if cached else None
+
+
+def make_job_dir(video_id=None):
+    # Named after the video so a track interrupted mid-way finds its files again on the next run
+    os.makedirs(work_root, exist_ok=True)
+    if video_id:
+        job_dir = os.path.join(work_root, f"job_{video_id}")
+        os.makedirs(job_dir, exist_ok=True)
+        return job_dir
+    return tempfile.mkdtemp(prefix="job_", dir=work_root)
+
+
+def resume_point(entry):
+    """
+    The furthest journal state of a track whose files are still on disk, or None.
+    Tracks that only got as far as 'resolved' start over, since the stream URLs
+    in an old info dict expire.
+    """
+    for state, path_key in (("tagged", "file_path"), ("transcoded", "file_path"), ("downloaded", "download_path")):
+        if reached(entry, state) and entry.get(path_key) and os.path.exists(entry[path_key]):
+            return state
+    return None
+
+
+def default_stage_workers(config):
+    """
+    Threads per pipeline stage. Network-bound stages run wide, the FFmpeg
+    stage is sized to the CPU count, and filing stays single-threaded.
+    Any stage can be overridden with config['pipeline_workers'].
+    """
+    network_workers = config.get('download_workers', 4)
+    workers = {
+        'resolve': network_workers,
+        'download': network_workers,
+        'transcode': os.cpu_count() or 2,
+        'enrich': network_workers,
+        'tag': 2,
+        'file': 1,
+    }
+    workers.update(config.get('pipeline_workers', {}))
+    return workers
+
+
+class DownloadSession:
+    """
+    Streams tracks through resolve -> download -> transcode -> enrich -> tag -> file.
+    Every link submitted before close() shares the same pipeline, so one
+    track can be transcoding while the next downloads and another is tagged.
+    """
+
+    def __init__(self, config, proxies, progress_bar, progress_label):
+        self.proxies = proxies
+        self.proxy_pool = get_proxy_pool(proxies, config)
+        self.reporter = ProgressReporter(progress_bar, progress_label, 0)
+        self.submitted = 0
+        self.finished = []
+        self.active_video_ids = set()
+        self.lock = threading.Lock()
+        self.journal = get_job_journal()
+
+        self.duplicate_policy = config.get('duplicate_policy', 'skip')
+        if self.duplicate_policy not in duplicate_policies:
+            print(f"❌ Unknown duplicate_policy '{self.duplicate_policy}', using 'skip'.")
+            self.duplicate_policy = 'skip'
+        # Tracks the journal shows we already filed are skipped whatever the policy, unless this is set
+        self.force_redownload = config.get('force_redownload', False)
+
+        # Bring the index up to date once, so every track can be checked against it before downloading
+        self.library = get_library_index()
+        self.library.refresh(music_path)
+
+        # Resolved tracks waiting for their album's batched GPT request
+        self.pending_albums = {}
+        self.album_locks = {}
+
+        workers = default_stage_workers(config)
+        self.pipeline = Pipeline([
+            Stage('resolve', self.resolve, workers['resolve']),
+            Stage('download', self.download, workers['download']),
+            Stage('transcode', self.transcode, workers['transcode']),
+            Stage('enrich', self.enrich, workers['enrich']),
+            Stage('tag', self.tag, workers['tag']),
+            Stage('file', self.file, workers['file']),
+        ], queue_size=config.get('pipeline_queue_size', 4),
+            on_done=self.job_done, on_dropped=self.job_ended, on_error=self.job_failed).start()
+
+        with active_sessions_lock:
+            active_sessions.add(self)
+
+    def submit(self, urls, resolve_url=None):
+        """
+        Queues every URL of one link. resolve_url, if given, turns each entry
+        into a YouTube URL inside the resolve stage (used for Spotify links).
+        """
+        self.reporter.add_tracks(len(urls))
+        for index, url in enumerate(urls):
+            if self.cancelled:
+                return
+            with self.lock:
+                self.submitted += 1
+            # The proxy is chosen by the proxy pool when the track is resolved
+            self.pipeline.submit({
+                'url': url,
+                'track_num': index + 1,
+                'total': len(urls),
+                'proxy': None,
+                'resolve_url': resolve_url,
+            })
+
+    def close(self):
+        """Waits for every submitted track and returns the jobs that were filed."""
+        self.pipeline.close()
+        with active_sessions_lock:
+            active_sessions.discard(self)
+        if self.proxies:
+            self.proxy_pool.print_stats()
+        for stats in rate_limit_stats():
+            print(f"{stats['provider']}: {stats['requests']} requests, {stats['waited_requests']} waited "
+                  f"(avg {stats['average_wait']}s, max {stats['max_wait']}s), throttled {stats['throttled']} times")
+        return self.finished
+
+    def cancel(self):
+        """Drops the tracks still queued and waits for the ones in flight, so no file is left half-written."""
+        self.pipeline.cancel()
+        with active_sessions_lock:
+            active_sessions.discard(self)
+
+    @property
+    def cancelled(self):
+        return self.pipeline.cancelled.is_set()
+
+    def resolve(self, job):
+        self.reporter.track_started()
+        if job['resolve_url']:
+            source_url = job['url']
+            job['url'] = job['resolve_url'](source_url)
+            if not job['url']:
+                print(f"❌ Could not resolve track {job['track_num']}, skipping.")
+                return None
+            job['isrc'] = known_isrc(source_url)
+
+        video_id = parse_video_id(job['url'])
+        entry = self.journal.get(video_id)
+        if self.already_filed(job, entry) or self.skip_owned(job, video_id, job.get('isrc')):
+            return None
+
+        state = resume_point(entry)
+        if state:
+            # Pick the track up where an earlier run left it
+            print(f"🔁 Resuming track {job['track_num']} ({entry['track']['title']}) after '{state}'")
+            job.update(entry['track'])
+            job.update({
+                'video_id': entry['info']['id'],
+                'info_dict': entry['info'],
+                'work_dir': entry.get('work_dir'),
+                'download_path': entry.get('download_path'),
+                'file_path': entry.get('file_path'),
+                'resume': {'state': state},
+            })
+        else:
+            with self.proxy_pool.lease() as lease:
+                job['proxy'] = lease.proxy
+                print(f"Using proxy: {job['proxy']}")
+                # Deleted, private or restricted videos say nothing about the proxy, so only network errors count against it
+                info_dict = extract_track_info(job['url'], job['proxy'], on_network_error=lease.fail)
+            if info_dict is None:
+                return None
+
+            job.update(describe_track(info_dict))
+            job['info_dict'] = info_dict
+            job['video_id'] = info_dict.get('id')
+
+            # URLs we couldn't read a video ID from are only checked now
+            if not video_id and (self.already_filed(job, self.journal.get(job['video_id'])) or self.skip_owned(job, job['video_id'])):
+                return None
+
+        if not self.claim(job):
+            return None
+
+        if not state:
+            track = {key: job[key] for key in ('title', 'artist', 'album', 'release_year')}
+            self.journal.record(job['video_id'], 'resolved', url=job['url'], track=track, info=trim_info_dict(job['info_dict']))
+
+        if job['album'] and job['album'] != 'N/A' and not reached(job.get('resume'), 'tagged'):
+            with self.lock:
+                self.pending_albums.setdefault((job['artist'], job['album']), []).append(job)
+        return job
+
+    def already_filed(self, job, entry):
+        """
+        True if an earlier run already filed this video and the file is still there.
+        duplicate_policy only covers library files the journal doesn't know about.
+        """
+        if self.force_redownload:
+            return False
+        if reached(entry, 'filed') and entry.get('final_path') and os.path.exists(entry['final_path']):
+            print(f"⏭️ Track {job['track_num']} is already in the library: {os.path.basename(entry['final_path'])}")
+            return True
+        return False
+
+    def skip_owned(self, job, video_id, isrc=None):
+        """With the 'skip' policy, True if the library already has this video or recording."""
+        if self.duplicate_policy != 'skip':
+            return False
+        owned = self.library.find_owned(video_id, isrc)
+        if owned:
+            print(f"⏭️ Track {job['track_num']} is already in the library: {os.path.basename(owned['path'])}")
+            return True
+        return False
+
+    def claim(self, job):
+        """Makes sure the same video isn't worked on twice at once, since it would share a work folder."""
+        with self.lock:
+            if job['video_id'] in self.active_video_ids:
+                print(f"⏭️ Track {job['track_num']} is already queued, skipping the duplicate.")
+                return False
+            if job['video_id']:
+                self.active_video_ids.add(job['video_id'])
+                job['claimed'] = True
+        return True
+
+    def download(self, job):
+        if reached(job.get('resume'), 'downloaded'):
+            return job
+
+        job['work_dir'] = make_job_dir(job['video_id'])
+        job['download_path'] = None
+        try:
+            # Stream URLs can be tied to the address that extracted them, so stay on the resolve stage's proxy if it is healthy
+            self.download_through_proxy(job, preferred=job['proxy'])
+        except yt_dlp.utils.DownloadError as e:
+            print(f"Download failed: {e}")
+            print("Attempting to update cookies...")
+            update_cookies()
+
+            print("Retrying download after updating cookies...")
+            self.download_through_proxy(job, reextract=True)
+
+        if not job['download_path']:
+            return None
+        self.journal.record(job['video_id'], 'downloaded', work_dir=job['work_dir'], download_path=job['download_path'])
+        return job
+
+    def download_through_proxy(self, job, preferred=None, reextract=False):
+        """
+        Downloads the job's audio on a leased proxy, extracting it again first if asked
+        to or if the proxy changed. A DownloadError is raised once the lease is handed
+        back, and only counts against the proxy if it was a network error.
+        """
+        with self.proxy_pool.lease(preferred=preferred) as lease:
+            if lease.proxy != job['proxy'] and not reextract:
+                print(f"Proxy {job['proxy']} is resting, switching to {lease.proxy}")
+                reextract = True
+            if reextract and not self.reextract(job, lease):
+                return
+
+            try:
+                job['download_path'] = download_audio(job['info_dict'], job['title'], job['work_dir'], job['proxy'])
+            except yt_dlp.utils.DownloadError as e:
+                if is_network_error(e):
+                    lease.fail()
+                error = e
+            else:
+                lease.transferred(os.path.getsize(job['download_path']))
+                return
+        raise error
+
+    def reextract(self, job, lease):
+        job['proxy'] = lease.proxy
+        info_dict = extract_track_info(job['url'], job['proxy'], retry=False, on_network_error=lease.fail)
+        if info_dict is None:
+            return False
+        job['info_dict'] = info_dict
+        return True
+
+    def transcode(self, job):
+        if reached(job.get('resume'), 'transcoded'):
+            return job
+
+        job['file_path'] = transcode_to_mp3(job['download_path'])
+        self.journal.record(job['video_id'], 'transcoded', file_path=job['file_path'])
+        return job
+
+    def enrich(self, job):
+        if reached(job.get('resume'), 'tagged'):
+            return job
+
+        self.prefetch_album(job)
+        job['metadata'], job['album_art_url'] = get_enricher().lookup(job)
+        return job
+
+    def prefetch_album(self, job):
+        # The first track of an album to reach this stage asks GPT about every resolved
+        # track of that album at once; the others wait for it and then hit the cache
+        key = (job['artist'], job['album'])
+        with self.lock:
+            album_lock = self.album_locks.setdefault(key, threading.Lock())
+
+        with album_lock:
+            with self.lock:
+                pending = self.pending_albums.pop(key, [])
+            if pending:
+                get_enricher().prefetch_album_metadata(pending)
+
+    def tag(self, job):
+        if reached(job.get('resume'), 'tagged'):
+            return job
+
+        job['bytes_written'] = get_enricher().tag(job, job['metadata'], job['album_art_url'])
+        self.journal.record(job['video_id'], 'tagged')
+        return job
+
+    def file(self, job):
+        # The ISRC may only have turned up during enrichment, so check the library once more
+        owned = None
+        if self.duplicate_policy != 'keep-both':
+            owned = self.library.find_owned(job['video_id'], job.get('isrc'))
+
+        if owned and self.duplicate_policy == 'skip':
+            print(f"⏭️ Not filing track {job['track_num']}, the library already has it: {os.path.basename(owned['path'])}")
+            self.journal.record(job['video_id'], 'filed', final_path=owned['path'])
+            job['discard'] = True
+            return None
+
+        if owned:  # 'replace'
+            job['final_path'] = self.replace_owned(job, owned['path'])
+        else:
+            job['final_path'] = get_enricher().file(job)
+
+        if job['final_path']:
+            self.journal.record(job['video_id'], 'filed', final_path=job['final_path'])
+            self.library.update_file(job['final_path'])
+        return job
+
+    def replace_owned(self, job, old_path):
+        """
+        Files the new download in place of old_path. The old file is only moved
+        aside while filing, and is put back if the new one doesn't land.
+        """
+        print(f"♻️ Replacing {os.path.basename(old_path)} with the new download.")
+        aside_path = f"{old_path}.replacing"
+        try:
+            os.replace(old_path, aside_path)
+        except OSError as e:
+            print(f"❌ Could not move the old file aside, keeping both: {e}")
+            return get_enricher().file(job)
+
+        final_path = None
+        try:
+            final_path = get_enricher().file(job)
+        finally:
+            if final_path:
+                os.remove(aside_path)
+                if final_path != old_path:
+                    self.library.update_file(old_path)
+            else:
+                print(f"❌ Filing the new download failed, restoring {os.path.basename(old_path)}.")
+                os.replace(aside_path, old_path)
+        return final_path
+
+    def job_done(self, job):
+        with self.lock:
+            self.finished.append(job)
+        self.job_ended(job, finished=True)
+
+    def job_failed(self, job, stage_name, error):
+        print(f"❌ Track {job['track_num']} ({job['url']}) failed during {stage_name}: {error}")
+        self.job_ended(job)
+
+    def job_ended(self, job, finished=False):
+        # Unfinished tracks keep their journaled work folder so the next run can resume them
+        if job.get('work_dir') and (finished or job.get('discard') or not job.get('video_id')):
+            shutil.rmtree(job['work_dir'], ignore_errors=True)
+        if job.get('claimed'):
+            with self.lock:
+                self.active_video_ids.discard(job['video_id'])
+        self.reporter.track_finished()
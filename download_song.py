@@ -4,18 +4,43 @@ import yt_dlp
 import subprocess
 import re  # Regex for title sanitization
 import time
-from download_metadata import main
+import threading
 from cookie_exporter import cookie_main
 
-
-# Get the absolute path to python.exe in your virtual environment or bundled exe
-if getattr(sys, 'frozen', False):  # Running as a PyInstaller executable
-    venv_python_path = sys.executable  # or set to your python path
-else:
-    venv_python_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'venv', 'Scripts', 'python.exe')
-
 # Initialize the download counter
 download_count = 0
+download_count_lock = threading.Lock()
+
+# Only one worker at a time should refresh the cookies file
+cookie_lock = threading.Lock()
+
+# Errors that usually mean our cookies are stale rather than the video being gone
+auth_error_messages = [
+    "Login required", "403 Forbidden", "Premium",
+    "Sign in to confirm your age", "This video may be inappropriate", "Video unavailable"
+]
+
+# HTTP statuses that point at the proxy or the connection rather than at the video
+proxy_error_statuses = (403, 429)
+
+
+def is_network_error(error):
+    """
+    True if a yt-dlp error came from the connection or proxy (timeouts, refused
+    connections, 403/429/5xx) rather than from the video itself, e.g. a deleted,
+    private or age-restricted video.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, yt_dlp.networking.exceptions.HTTPError):
+            return error.status in proxy_error_statuses or error.status >= 500
+        if isinstance(error, (yt_dlp.networking.exceptions.TransportError, TimeoutError, ConnectionError)):
+            return True
+        # yt-dlp wraps the underlying error: ExtractorError.cause, DownloadError.exc_info
+        exc_info = getattr(error, 'exc_info', None)
+        error = getattr(error, 'cause', None) or (exc_info[1] if exc_info else None) or error.__cause__
+    return False
 
 # Function to sanitize the song title by replacing special characters
 def sanitize_title(title):
@@ -24,20 +49,24 @@ def sanitize_title(title):
     title = title.strip()  # Remove leading/trailing spaces
     return title
 
+# Pull the 11-character video ID out of a YouTube or YouTube Music URL
+def parse_video_id(url):
+    match = re.search(r'(?:v=|youtu\.be/|/shorts/)([\w-]{11})', url or "")
+    return match.group(1) if match else None
+
 # Function to update cookies by running cookie_exporter.py
 def update_cookies():
     print("Updating cookies...")
-    try:
-        cookie_main()
-        print("Cookies updated successfully.")
-    except subprocess.CalledProcessError as e:
-        print(f"Failed to update cookies: {e}")
+    with cookie_lock:
+        try:
+            cookie_main()
+            print("Cookies updated successfully.")
+        except subprocess.CalledProcessError as e:
+            print(f"Failed to update cookies: {e}")
 
 
-# Function to download song with metadata from YouTube Music URL
-def download_song_with_metadata(url, track_num, proxy=None, retry=True, total=1):
-    # Check and handle shortened "browse" URLs
-   # Determine the correct base directory
+def build_ydl_opts(proxy=None):
+    # Determine the correct base directory
     if getattr(sys, 'frozen', False):  # Running as a PyInstaller executable
         BASE_DIR = sys._MEIPASS
     else:  # Running as a normal script
@@ -47,44 +76,59 @@ def download_song_with_metadata(url, track_num, proxy=None, retry=True, total=1)
     cookies_file_path = os.path.join(BASE_DIR, "cookies.txt")
 
     cookies_file_path = 'C:/Users/Gamer/Desktop/metadata_filler/cookies.txt'
-    
+
     ydl_opts = {
-        'cookiefile': cookies_file_path
+        'cookiefile': cookies_file_path,
+        'format': 'bestaudio/best'  # Select the audio format up front so the extracted info can be downloaded as-is
     }
 
     if proxy:
         ydl_opts['proxy'] = proxy if proxy.startswith("http") else f"http://{proxy}"
 
+    return ydl_opts
+
+
+# Resolve stage: extract the track's info dict once, refreshing cookies on auth errors
+def extract_track_info(url, proxy=None, retry=True, on_network_error=None):
+    """
+    The track's info dict, or None if it couldn't be extracted.
+    on_network_error is called for failures caused by the connection or proxy (see is_network_error).
+    """
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with yt_dlp.YoutubeDL(build_ydl_opts(proxy)) as ydl:
             info_dict = ydl.extract_info(url, download=False)
             print(f"Using Proxy: {proxy}") if proxy else print("No proxy used.")
             print("Metadata extracted successfully:", info_dict["title"])
 
             global download_count
-            download_count += 1
-            print(f"Number of songs downloaded: {download_count}")
+            with download_count_lock:
+                download_count += 1
+                print(f"Number of songs downloaded: {download_count}")
 
     except (yt_dlp.utils.ExtractorError, yt_dlp.utils.DownloadError) as e:
         print("ERROR:", e)
         print(f"Total songs downloaded before error: {download_count}")
         error_message = str(e)  # Store the error message first
+        if on_network_error and is_network_error(e):
+            on_network_error()
 
         # Check if the error is related to authentication, premium restriction, or age restriction
-        if any(msg in error_message for msg in [
-            "Login required", "403 Forbidden", "Premium", 
-            "Sign in to confirm your age", "This video may be inappropriate", "Video unavailable"
-        ]):
+        if any(msg in error_message for msg in auth_error_messages):
             print("Authentication, Premium restriction, or Age restriction detected. Attempting to update cookies...")
             update_cookies()
 
             if retry:
                 print("Retrying download after updating cookies...")
                 time.sleep(2)  # Small delay before retrying
-                return download_song_with_metadata(url, track_num, proxy, retry=False)
+                return extract_track_info(url, proxy, retry=False, on_network_error=on_network_error)
 
         return None
 
+    return info_dict
+
+
+# Pull the fields the rest of the pipeline needs out of the info dict
+def describe_track(info_dict):
     title = info_dict.get('title', 'N/A')
     artist = info_dict.get('artist', 'N/A')
     album = info_dict.get('album', 'N/A')
@@ -101,49 +145,37 @@ def download_song_with_metadata(url, track_num, proxy=None, retry=True, total=1)
     print(f"Track Number: {track_number}")
     print(f"Release Year: {release_year}")
 
-    ydl_opts.update({
-        'format': 'bestaudio/best',
-        'outtmpl': f'{sanitized_title}.%(ext)s',
-        'extractaudio': True,
-        'audioquality': 1,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-            'nopostoverwrites': False
-        }]
-    })
-
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-    except yt_dlp.utils.DownloadError as e:
-        print(f"Download failed: {e}")
-        print("Attempting to update cookies...")
-        update_cookies()
-        if retry:
-                print("Retrying download after updating cookies...")
-                time.sleep(2)  # Small delay before retrying
-                return download_song_with_metadata(url, track_num, proxy, retry=False)
-        
-        return None
-        
-
-
-    mp3_filename = f"{sanitized_title}.mp3"
-
-    # Get the absolute path to python.exe in your virtual environment
-    venv_python_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'venv', 'Scripts', 'python.exe')
-
-    # Get the absolute path to download_metadata.py
-    download_metadata_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'download_metadata.py')
-
-    print("Python Path:", venv_python_path)
-    print("Download Metadata Path:", download_metadata_path)
-    print("File Exists:", os.path.exists(download_metadata_path))
-
+    return {
+        'title': sanitized_title,
+        'artist': artist,
+        'album': album,
+        'release_year': release_year,
+    }
 
-    # Run subprocess with absolute path
-    subprocess.run([venv_python_path, download_metadata_path, artist, album, sanitized_title, mp3_filename, str(track_num), str(release_year),url])
 
-    return info_dict
+# Download stage: fetch the selected audio stream as-is, without transcoding
+def download_audio(info_dict, sanitized_title, output_dir, proxy=None):
+    ydl_opts = build_ydl_opts(proxy)
+    ydl_opts['outtmpl'] = os.path.join(output_dir, f'{sanitized_title}.%(ext)s')
+
+    # Download from the info dict we already extracted instead of resolving the page again
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        result = ydl.process_ie_result(info_dict, download=True)
+        downloads = result.get('requested_downloads') or [{}]
+        return downloads[0].get('filepath') or ydl.prepare_filename(result)
+
+
+# Transcode stage: convert the downloaded stream to a 192 kbps MP3 next to it
+def transcode_to_mp3(source_path, quality='192'):
+    mp3_path = os.path.splitext(source_path)[0] + '.mp3'
+    if source_path == mp3_path:
+        return mp3_path
+
+    subprocess.run([
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-i', source_path,
+        '-vn', '-codec:a', 'libmp3lame', '-b:a', f'{quality}k',
+        mp3_path
+    ], check=True)
+    os.remove(source_path)
+    return mp3_path
@@ -0,0 +1,147 @@
+import json
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+from storage import config_path, shared_instance
+
+# ChromeDriverManager().install() checks for a new driver release, so only do it once per run
+chromedriver_path = None
+chromedriver_lock = threading.Lock()
+
+
+def get_chromedriver_path():
+    global chromedriver_path
+    with chromedriver_lock:
+        if chromedriver_path is None:
+            chromedriver_path = ChromeDriverManager().install()
+        return chromedriver_path
+
+
+def setup_chrome_driver():
+    """Set up the Chrome WebDriver with headless options."""
+    options = Options()
+    # options.add_argument('--headless')  # Uncomment to run headless
+    options.add_argument('--disable-gpu')
+    options.add_argument('--window-size=1280,800')
+    return webdriver.Chrome(service=Service(get_chromedriver_path()), options=options)
+
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+
+
+class DriverPool:
+    """
+    Keeps up to `size` Chrome instances alive and lends them out to the scrapers.
+
+    Idle drivers are health-checked before they are handed out, and a driver
+    is replaced after recycle_after checkouts so long batches don't run on
+    an ever-growing browser. Every driver is quit on close() or at exit.
+    """
+
+    def __init__(self, size=2, recycle_after=25):
+        self.size = max(1, int(size))
+        self.recycle_after = max(1, int(recycle_after))
+
+        self.idle = queue.LifoQueue()  # Reuse the most recently used (warmest) driver first
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.lock = threading.Lock()
+        self.live = set()
+        self.closed = False
+
+    @contextmanager
+    def checkout(self):
+        """Lends a driver for the duration of the with block and takes it back, even on errors."""
+        if self.closed:
+            raise RuntimeError("The driver pool has been closed.")
+
+        self.slots.acquire()
+        pooled = None
+        try:
+            pooled = self.take()
+            pooled.uses += 1
+            yield pooled.driver
+        finally:
+            # Drivers that broke while lent out are caught by the health check on the next take()
+            if pooled is not None:
+                self.give_back(pooled)
+            self.slots.release()
+
+    def take(self):
+        while True:
+            try:
+                pooled = self.idle.get_nowait()
+            except queue.Empty:
+                return self.launch()
+
+            if self.is_healthy(pooled):
+                return pooled
+            print("🧹 Replacing an unresponsive Chrome instance.")
+            self.discard(pooled)
+
+    def launch(self):
+        pooled = PooledDriver(setup_chrome_driver())
+        with self.lock:
+            self.live.add(pooled)
+        return pooled
+
+    def give_back(self, pooled):
+        if self.closed or pooled.uses >= self.recycle_after:
+            self.discard(pooled)
+        else:
+            self.idle.put(pooled)
+
+    def is_healthy(self, pooled):
+        try:
+            pooled.driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def discard(self, pooled):
+        if pooled is None:
+            return
+        with self.lock:
+            self.live.discard(pooled)
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            print(f"❌ Failed to quit Chrome: {e}")
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            remaining = list(self.live)
+        for pooled in remaining:
+            self.discard(pooled)
+        if remaining:
+            print(f"🧹 Closed {len(remaining)} pooled browser(s).")
+
+
+def load_pool_config():
+    try:
+        with open(config_path, "r") as config_file:
+            return json.load(config_file).get("driver_pool", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def create_driver_pool():
+    pool_config = load_pool_config()
+    driver_pool = DriverPool(
+        size=pool_config.get("size", 2),
+        recycle_after=pool_config.get("recycle_after", 25)
+    )
+    atexit.register(driver_pool.close)
+    return driver_pool
+
+
+get_driver_pool = shared_instance(create_driver_pool)
@@ -1,16 +1,44 @@
-import requests
+import os
 from mutagen.mp3 import MP3
-from io import BytesIO
-import magic
-from mutagen.id3 import ID3, COMM, TPUB, TENC, WCOP, TCOP, TPE3, TCOM, TMOO, TKEY, TBPM, TPOS, TCON, TXXX, TXXX, APIC, TIT2, TPE1, TALB, TDRC, TRCK
+from art_cache import get_art_cache
+from yt_art_scrapper import crop_to_square
+from mutagen.id3 import ID3, COMM, TPUB, TENC, WCOP, TCOP, TPE3, TCOM, TMOO, TKEY, TBPM, TPOS, TCON, TXXX, TXXX, APIC, TIT2, TPE1, TALB, TDRC, TRCK, TSRC
 from chat_gpt import get_all_metadata
+from library_index import video_id_desc, isrc_desc, synchsafe
 
-def embed_metadata(file_path, metadata, album_art_url,track_num,yt_album_name):
+# Free space left in the ID3 header whenever it has to grow, so later re-tags can be written in place
+id3_padding_bytes = 16 * 1024
+
+
+def reserve_padding(info):
+    # Keep the existing padding if everything still fits; otherwise grow once with room to spare
+    if info.padding >= 0:
+        return info.padding
+    return id3_padding_bytes
+
+
+def id3_tag_size(file_path):
+    """Total size of the ID3v2 tag at the start of the file (header included), or 0 if there is none."""
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(10)
+    except OSError:
+        return 0
+
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+
+    size = synchsafe(header[6:10])
+    has_footer = header[5] & 0x10
+    return size + 10 + (10 if has_footer else 0)
+
+
+def embed_metadata(file_path, metadata, album_art_url,track_num,yt_album_name, video_id=None, isrc=None, crop_art=False):
     try:
         audio = MP3(file_path, ID3=ID3)  # Make sure ID3 is correctly imported at the top
     except Exception as e:
         print(f"Error loading MP3 file: {e}")
-        return
+        return 0
 
     # Ensure ID3 tags exist
     if audio.tags is None:
@@ -105,37 +133,47 @@ def embed_metadata(file_path, metadata, album_art_url,track_num,yt_album_name):
     if 'part_of_compilation' in metadata:
         audio['TCMP'] = TXXX(encoding=3, desc='TCMP', text=str(metadata['part_of_compilation']))  # unofficial tag used by iTunes
 
+    # Where the track came from, so the library index can spot re-downloads of it
+    if video_id:
+        set_txxx(audio, video_id_desc, video_id)
 
+    if isrc:
+        set_txxx(audio, isrc_desc, isrc)
+        audio.tags.setall('TSRC', [TSRC(encoding=3, text=isrc)])
 
-    # Save changes
-    try:
-        audio.save()
-        print("Metadata embedded successfully!")
-    except Exception as e:
-        print(f"Error saving metadata: {e}")
 
-    # Download and embed album art
+
+    # Download and embed album art (shared cache, so an album's cover is fetched once)
     if album_art_url:
         try:
-            response = requests.get(album_art_url)
-            if response.status_code == 200:
-                image_data = BytesIO(response.content)
-                mime_type = magic.Magic(mime=True).from_buffer(image_data.read(2048))
-
-                if mime_type in ['image/jpeg', 'image/png']:
-                    audio.tags.add(APIC(encoding=3, mime=mime_type, type=3, desc='Cover', data=image_data.getvalue()))
-                else:
-                    print("Unsupported image format. Convert to JPEG before embedding.")
-            else:
+            image_data, mime_type = get_art_cache().fetch(album_art_url)
+            if image_data is not None and crop_art:
+                image_data, mime_type = crop_to_square(image_data), 'image/jpeg'
+            if image_data is None:
                 print("Failed to download album art.")
+            elif mime_type in ['image/jpeg', 'image/png']:
+                audio.tags.add(APIC(encoding=3, mime=mime_type, type=3, desc='Cover', data=image_data))
+            else:
+                print("Unsupported image format. Convert to JPEG before embedding.")
         except Exception as e:
             print(f"Error fetching album art: {e}")
 
+    # Commit every frame, art included, in a single write
+    old_tag_size = id3_tag_size(file_path)
     try:
-        audio.save(v2_version=3)  # Force ID3 v2.3
-        print("Album art and metadata saved successfully!")
+        audio.save(v2_version=3, padding=reserve_padding)  # Force ID3 v2.3
     except Exception as e:
-        print(f"Error saving album art: {e}")
+        print(f"Error saving metadata: {e}")
+        return 0
+
+    # If the new tag fit in the old one's space only the tag was rewritten, otherwise the whole file was
+    new_tag_size = id3_tag_size(file_path)
+    if old_tag_size and new_tag_size == old_tag_size:
+        bytes_written = new_tag_size
+    else:
+        bytes_written = os.path.getsize(file_path)
+    print(f"Album art and metadata saved successfully! ({bytes_written} bytes written)")
+    return bytes_written
 
 
 # if __name__ == '__main__':
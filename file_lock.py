@@ -0,0 +1,41 @@
+import os
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path, timeout=30, stale_after=60):
+    """
+    Cross-process lock guarding `path`, held by creating `path`.lock exclusively.
+    Works the same on Windows and Linux and between threads of one process.
+    A lock file older than stale_after seconds is assumed to belong to a
+    crashed process and is taken over.
+    """
+    lock_path = f"{path}.lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    deadline = time.time() + timeout
+
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue  # The holder released it between our checks
+
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for lock on {path}")
+            time.sleep(0.05)
+
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
@@ -1,5 +1,6 @@
 import os
 import eyed3
+from library_index import get_library_index
 
 # Function to update song metadata
 def update_song_metadata(file_path):
@@ -33,11 +34,15 @@ def update_song_metadata(file_path):
 
 # Function to process all mp3 files in a folder
 def process_folder(folder_path):
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".mp3"):
-            file_path = os.path.join(folder_path, filename)
-            print(f"Processing {filename}...")
-            update_song_metadata(file_path)
-            print(f"Updated {filename} metadata")
+    index = get_library_index()
+    # Only files listing several artists need splitting; the index tells us which those are
+    for entry in index.files(folder_path):
+        if not entry['artist'] or ',' not in entry['artist']:
+            continue
+        filename = os.path.basename(entry['path'])
+        print(f"Processing {filename}...")
+        update_song_metadata(entry['path'])
+        index.update_file(entry['path'])
+        print(f"Updated {filename} metadata")
 
 
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import threading
+from storage import cache_dir, connect_sqlite
+
+gpt_cache_path = os.path.join(cache_dir(), "gpt_metadata.sqlite")
+
+
+def normalize_field(value):
+    return " ".join(str(value or "").lower().split())
+
+
+def make_cache_key(input_metadata, model):
+    """Cache key built from the normalized (title, artist, album, year, model)."""
+    fields = [
+        input_metadata.get("title"),
+        input_metadata.get("contributing_artist") or input_metadata.get("album_artist"),
+        input_metadata.get("album"),
+        input_metadata.get("year"),
+        model,
+    ]
+    return "\x1f".join(normalize_field(field) for field in fields)
+
+
+class GPTMetadataCache:
+    """
+    SQLite cache of get_all_metadata results.
+    Entries expire after ttl_seconds, and once more than max_entries are
+    stored the least recently used ones are evicted.
+    """
+
+    def __init__(self, path=gpt_cache_path, ttl_seconds=90 * 24 * 3600, max_entries=50000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS gpt_metadata (
+                    cache_key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS gpt_metadata_last_used ON gpt_metadata (last_used)")
+
+    def connect(self):
+        return connect_sqlite(self.path)
+
+    def get(self, input_metadata, model):
+        key = make_cache_key(input_metadata, model)
+        now = time.time()
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM gpt_metadata WHERE cache_key = ?", (key,)
+            ).fetchone()
+
+            if row and now - row[1] <= self.ttl_seconds:
+                conn.execute("UPDATE gpt_metadata SET last_used = ? WHERE cache_key = ?", (now, key))
+                self.count(hit=True)
+                return json.loads(row[0])
+
+            if row:
+                conn.execute("DELETE FROM gpt_metadata WHERE cache_key = ?", (key,))
+
+        self.count(hit=False)
+        return None
+
+    def contains(self, input_metadata, model):
+        """True if a fresh entry exists. Unlike get(), doesn't touch the hit/miss counters."""
+        key = make_cache_key(input_metadata, model)
+        with self.connect() as conn:
+            row = conn.execute("SELECT created_at FROM gpt_metadata WHERE cache_key = ?", (key,)).fetchone()
+        return bool(row) and time.time() - row[0] <= self.ttl_seconds
+
+    def put(self, input_metadata, model, response):
+        key = make_cache_key(input_metadata, model)
+        now = time.time()
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO gpt_metadata (cache_key, response, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now)
+            )
+            self.evict(conn)
+
+    def evict(self, conn):
+        count = conn.execute("SELECT COUNT(*) FROM gpt_metadata").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM gpt_metadata WHERE cache_key IN "
+                "(SELECT cache_key FROM gpt_metadata ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,44 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from storage import shared_instance
+
+# (connect, read) seconds; used whenever a call doesn't pass its own timeout
+default_timeout = (5, 30)
+
+
+class PooledSession(requests.Session):
+    """requests.Session that never waits forever: every request gets default_timeout unless it sets one."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+def build_session(pool_connections=16, pool_maxsize=32, retries=3):
+    """
+    A session keeping connections alive per host, so repeated calls to
+    api.spotify.com, musicbrainz.org, coverartarchive.org and the art CDNs
+    skip the TCP and TLS handshakes. Connection failures and 500/502/504s
+    are retried with backoff; 429/503 are left to rate_limiter, which
+    knows to pause every worker for the Retry-After period.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=2,
+        status=2,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = PooledSession()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+get_http_session = shared_instance(build_session)
@@ -0,0 +1,81 @@
+import os
+import json
+import time
+from storage import cache_dir, connect_sqlite, shared_instance
+
+job_journal_path = os.path.join(cache_dir(), "job_journal.sqlite")
+
+# The order a track moves through the pipeline in
+journal_states = ["resolved", "downloaded", "transcoded", "tagged", "filed"]
+
+# The parts of the yt-dlp info dict the later stages use, kept so a resumed track needn't be extracted again
+journal_info_keys = ["id", "title", "artist", "album", "track", "track_number", "duration", "release_year", "thumbnails", "webpage_url"]
+
+
+def reached(entry, state):
+    """True if the journal entry is at `state` or further along."""
+    return bool(entry) and journal_states.index(entry["state"]) >= journal_states.index(state)
+
+
+def trim_info_dict(info_dict):
+    return {key: info_dict.get(key) for key in journal_info_keys if info_dict.get(key) is not None}
+
+
+class JobJournal:
+    """
+    Crash-safe record of how far each track got, keyed by YouTube video ID.
+
+    Every stage writes its state and the paths it produced as soon as it
+    finishes, in its own committed transaction, so after the app is closed
+    or crashes a re-run can skip filed tracks and pick the others up at
+    the stage they reached.
+    """
+
+    def __init__(self, path=job_journal_path):
+        self.path = path
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    video_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def connect(self):
+        return connect_sqlite(self.path, synchronous="FULL")  # A recorded state must survive a crash
+
+    def get(self, video_id):
+        """Returns {'state': ..., plus every recorded field} for the video, or None."""
+        if not video_id:
+            return None
+        with self.connect() as conn:
+            row = conn.execute("SELECT state, data FROM jobs WHERE video_id = ?", (video_id,)).fetchone()
+        if not row:
+            return None
+        entry = json.loads(row[1])
+        entry["state"] = row[0]
+        return entry
+
+    def record(self, video_id, state, **fields):
+        """Moves the video to `state`, merging `fields` into what is already recorded for it."""
+        if not video_id:
+            return
+        with self.connect() as conn:
+            row = conn.execute("SELECT data FROM jobs WHERE video_id = ?", (video_id,)).fetchone()
+            data = json.loads(row[0]) if row else {}
+            data.update(fields)
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (video_id, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                (video_id, state, json.dumps(data), time.time())
+            )
+
+    def forget(self, video_id):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE video_id = ?", (video_id,))
+
+
+get_job_journal = shared_instance(JobJournal)
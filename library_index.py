@@ -0,0 +1,262 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from mutagen.mp3 import MP3
+from mutagen.id3 import ID3, APIC
+from storage import cache_dir, connect_sqlite, shared_instance
+
+library_index_path = os.path.join(cache_dir(), "library.sqlite")
+
+# TXXX descriptions holding where a track came from
+video_id_desc = "YouTube Video ID"
+isrc_desc = "ISRC"
+
+columns = [
+    "path", "folder", "size", "mtime_ns", "ctime", "title", "artist", "album", "album_artist",
+    "track_number", "disc_number", "duration", "art_hash", "video_id", "isrc"
+]
+
+
+def under_folder(folder):
+    """SQL condition (and its parameters) matching rows in folder or any subfolder of it."""
+    prefix = os.path.join(folder, "")
+    return "(folder = ? OR substr(folder, 1, ?) = ?)", (folder, len(prefix), prefix)
+
+
+def first_text(tags, key):
+    frame = tags.get(key) if tags else None
+    if frame is None or not getattr(frame, "text", None):
+        return None
+    return str(frame.text[0])
+
+
+def synchsafe(data):
+    # ID3v2 tag sizes (and ID3v2.4 frame sizes) use 7 bits per byte
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def read_entry(path, stat):
+    """Reads the tags the index keeps for one MP3. Returns a dict keyed by the index columns."""
+    entry = dict.fromkeys(columns)
+    entry.update({
+        "path": path,
+        "folder": os.path.dirname(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "ctime": stat.st_ctime,
+    })
+
+    try:
+        audio = MP3(path, ID3=ID3)
+    except Exception as e:
+        print(f"Skipping {os.path.basename(path)} in library index: {e}")
+        return entry
+
+    tags = audio.tags
+    entry.update({
+        "title": first_text(tags, "TIT2"),
+        "artist": first_text(tags, "TPE1"),
+        "album": first_text(tags, "TALB"),
+        "album_artist": first_text(tags, "TPE2"),
+        "track_number": first_text(tags, "TRCK"),
+        "disc_number": first_text(tags, "TPOS"),
+        "duration": audio.info.length if audio.info else None,
+        "video_id": first_text(tags, f"TXXX:{video_id_desc}"),
+        "isrc": first_text(tags, f"TXXX:{isrc_desc}") or first_text(tags, "TSRC"),
+    })
+
+    # Hash the art from the tag we just parsed, so each file is read once
+    if tags:
+        for frame in tags.getall("APIC"):
+            if isinstance(frame, APIC) and frame.data:
+                entry["art_hash"] = hashlib.sha256(frame.data).hexdigest()
+                break
+    return entry
+
+
+def read_entries(files, workers=None):
+    """
+    read_entry for each (path, stat) pair, spread across a thread pool.
+    File reads and hashlib release the GIL, so the threads overlap their I/O and art hashing.
+    """
+    if len(files) < 2:
+        return [read_entry(path, stat) for path, stat in files]
+    with ThreadPoolExecutor(max_workers=workers or min(8, (os.cpu_count() or 2) * 2)) as executor:
+        return list(executor.map(lambda item: read_entry(*item), files))
+
+
+class LibraryIndex:
+    """
+    Persistent index of the MP3s in the music folder.
+
+    refresh() only re-reads files whose (size, mtime) changed since the last
+    scan, so the folder tools can query tags from here instead of opening
+    every file in the library each time they run.
+    """
+
+    def __init__(self, path=library_index_path):
+        self.path = path
+        self.refresh_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS tracks (
+                    path TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    ctime REAL NOT NULL,
+                    title TEXT,
+                    artist TEXT,
+                    album TEXT,
+                    album_artist TEXT,
+                    track_number TEXT,
+                    disc_number TEXT,
+                    duration REAL,
+                    art_hash TEXT,
+                    video_id TEXT,
+                    isrc TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS tracks_folder ON tracks (folder)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tracks_album ON tracks (album)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tracks_folder_ctime ON tracks (folder, ctime)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tracks_video_id ON tracks (video_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS tracks_isrc ON tracks (isrc)")
+
+    def connect(self):
+        return connect_sqlite(self.path, row_factory=sqlite3.Row)
+
+    def refresh(self, folder):
+        """Brings the index up to date with every MP3 under folder. Returns how many files were re-read."""
+        folder = os.path.abspath(folder)
+        started = time.time()
+
+        with self.refresh_lock, self.connect() as conn:
+            condition, params = under_folder(folder)
+            known = {
+                row["path"]: (row["size"], row["mtime_ns"])
+                for row in conn.execute(f"SELECT path, size, mtime_ns FROM tracks WHERE {condition}", params)
+            }
+
+            seen = set()
+            changed = []
+            for root, _, files in os.walk(folder):
+                for file in files:
+                    if not file.lower().endswith(".mp3"):
+                        continue
+                    path = os.path.join(root, file)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    seen.add(path)
+                    if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                        changed.append((path, stat))
+
+            changed = read_entries(changed)
+            self.store(conn, changed)
+
+            removed = [(path,) for path in known if path not in seen]
+            conn.executemany("DELETE FROM tracks WHERE path = ?", removed)
+
+        if changed or removed:
+            print(f"Library index: {len(changed)} file(s) updated, {len(removed)} removed "
+                  f"in {time.time() - started:.1f}s.")
+        return len(changed)
+
+    def update_file(self, path):
+        """Re-reads a single file, e.g. right after we rewrote its tags."""
+        path = os.path.abspath(path)
+        with self.connect() as conn:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                conn.execute("DELETE FROM tracks WHERE path = ?", (path,))
+                return
+            self.store(conn, [read_entry(path, stat)])
+
+    def update_files(self, paths):
+        """Re-reads several files and stores them in one transaction."""
+        files = []
+        for path in paths:
+            path = os.path.abspath(path)
+            try:
+                files.append((path, os.stat(path)))
+            except OSError:
+                continue
+        entries = read_entries(files)
+        with self.connect() as conn:
+            self.store(conn, entries)
+
+    def current_entries(self, paths):
+        """Index rows for those of paths whose size and mtime still match the file on disk."""
+        current = {}
+        with self.connect() as conn:
+            for path in paths:
+                row = conn.execute("SELECT * FROM tracks WHERE path = ?", (os.path.abspath(path),)).fetchone()
+                if row is None:
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if (row["size"], row["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                    current[path] = dict(row)
+        return current
+
+    def store(self, conn, entries):
+        placeholders = ", ".join("?" for _ in columns)
+        conn.executemany(
+            f"INSERT OR REPLACE INTO tracks ({', '.join(columns)}) VALUES ({placeholders})",
+            [tuple(entry[column] for column in columns) for entry in entries]
+        )
+
+    def files(self, folder, recursive=False, refresh=True):
+        """Index rows (as dicts) for the MP3s in folder, refreshing first unless told not to."""
+        folder = os.path.abspath(folder)
+        if refresh:
+            self.refresh(folder)
+        with self.connect() as conn:
+            if recursive:
+                condition, params = under_folder(folder)
+                rows = conn.execute(f"SELECT * FROM tracks WHERE {condition} ORDER BY path", params)
+            else:
+                rows = conn.execute("SELECT * FROM tracks WHERE folder = ? ORDER BY path", (folder,))
+            return [dict(row) for row in rows]
+
+    def files_created_between(self, folder, start, end):
+        """
+        Index rows for the MP3s directly in folder whose creation time falls in [start, end].
+        A plain range query that doesn't refresh: the download session refreshes once when
+        it starts, and everything that writes into the music folder after that updates the
+        index for the files it wrote.
+        """
+        folder = os.path.abspath(folder)
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM tracks WHERE folder = ? AND ctime BETWEEN ? AND ? ORDER BY ctime",
+                (folder, start, end)
+            )
+            return [dict(row) for row in rows]
+
+    def find_owned(self, video_id=None, isrc=None):
+        """
+        The index row of a library file that came from the same video or has the same ISRC, or None.
+        Doesn't refresh, so it is cheap enough to ask before every download.
+        """
+        with self.connect() as conn:
+            for column, value in (("video_id", video_id), ("isrc", isrc)):
+                if not value:
+                    continue
+                for row in conn.execute(f"SELECT * FROM tracks WHERE {column} = ?", (value,)):
+                    if os.path.exists(row["path"]):
+                        return dict(row)
+        return None
+
+
+get_library_index = shared_instance(LibraryIndex)
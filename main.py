@@ -1,5 +1,4 @@
 import json
-import time
 import tkinter as tk
 from tkinter import ttk
 import webbrowser
@@ -8,11 +7,10 @@ import sys
 import io
 import threading
 import queue
-from process_youtube_link import inspect_link  
+from process_youtube_link import inspect_link, proxies, clean_up_music_folder  
+from download_pool import drain_ui_updates, run_on_ui, cancel_active_sessions, DownloadSession
+from browse_resolver import get_browse_resolver
 from tkinterdnd2 import TkinterDnD, DND_FILES, DND_ALL  # Import DND_ALL for text drops
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
 
 # Determine the correct base directory
 if getattr(sys, 'frozen', False):  # Running as a PyInstaller executable
@@ -57,6 +55,7 @@ def open_youtube():
         threading.Thread(target=handle_youtube_link, args=(url,), daemon=True).start()
 
 def handle_youtube_link(url):
+    url = get_browse_resolver().resolve(url)
     q.put(f"Processing YouTube Link: {url}\n")  # Queue the output
     inspect_link(url, progress_bar, progress_label)
 
@@ -100,36 +99,6 @@ def update_drop_area_size(drop_area):
     drop_area.config(height=new_height)
 
 
-# Function to check for "browse" in the URL and return the full URL if it's a shortened YouTube Music link
-def handle_browse_url(url):
-    if 'browse' in url:  # Check if the link contains "browse"
-        print(f"Detected 'browse' in URL: {url}")
-        
-        # Set Chrome options to disable pop-up blocking and connect to an existing Chrome session
-        chrome_options = Options()
-        chrome_options.debugger_address = config['chrome_debugger']['address']
-        # Get the directory where the script is located
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-        # Construct the relative path dynamically
-        driver_path = os.path.join(BASE_DIR, "plugins", "chromedriver-win64", "chromedriver.exe")
-        # Pass the correct Service object
-        service = Service(driver_path)
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        
-        # Open new tab
-        driver.execute_script("window.open('');")  # Open a blank new tab
-        driver.switch_to.window(driver.window_handles[-1])  # Switch to the new tab
-        driver.get(url)  # Navigate to the URL in the new tab
-
-        # Wait for the URL to fully load
-        time.sleep(2)  # Adjust this delay if necessary
-        full_url = driver.current_url
-        driver.close()  # Close the tab
-        driver.switch_to.window(driver.window_handles[0])  # Return to the main tab
-        return full_url
-
-
 # Add label for total progress bar
 total_progress_label = tk.Label(root, text="URL: 0 / 0", fg=neon_blue, bg="#0d0221", font=("Helvetica", 12, "bold"))
 total_progress_label.grid(row=5, column=0, pady=(0, 5), padx=20, sticky="w")  # Positioned above total progress bar
@@ -156,22 +125,29 @@ def process_download(drop_area):
     total_progress_label.config(text=f"URL: 0 / {len(urls)}")  # Update label initially
 
     def download_links():
-        for i, url in enumerate(urls):
-            progress_bar["value"] = 0  # Reset before each download
-            converted_url = handle_browse_url(url)  # Convert before processing
-            # Update total progress and label
-            total_progress_bar["value"] += 1
-            total_progress_label.config(text=f"URL: {total_progress_bar['value']} / {len(urls)}")
-            handle_youtube_link(converted_url)
+        # Every dropped link feeds the same pipeline, so tracks from the next
+        # link start downloading while the previous link is still tagging
+        session = DownloadSession(config, proxies, progress_bar, progress_label)
 
-            root.after(100, lambda i=i: drop_area.delete(i))  # Remove URL from the listbox
-            print(f"Download completed for: {url}")
+        # Expand every YouTube Music browse link of the batch at once, before queueing anything
+        converted_urls = get_browse_resolver().resolve_all(urls)
+
+        for i, (url, converted_url) in enumerate(zip(urls, converted_urls)):
+            q.put(f"Processing YouTube Link: {converted_url}\n")
+            inspect_link(converted_url, progress_bar, progress_label, session=session)
+
+            # Update total progress and label
+            run_on_ui(lambda i=i: total_progress_bar.config(value=i + 1))
+            run_on_ui(lambda i=i: total_progress_label.config(text=f"URL: {i + 1} / {len(urls)}"))
+            run_on_ui(lambda: drop_area.delete(0))  # Remove URL from the listbox
+            print(f"Queued all tracks for: {url}")
 
-            
+        finished = session.close()
+        if session.cancelled:
+            return  # The window is closing
+        clean_up_music_folder([job['final_path'] for job in finished if job.get('final_path')])
 
-        total_progress_bar["value"] = len(urls)  # Ensure full completion
-        progress_bar["value"] = 0  # Reset individual progress
-        total_progress_label.config(text=f"URL: {len(urls)} / {len(urls)}")  # Ensure it shows full completion
+        run_on_ui(lambda: progress_bar.config(value=0))  # Reset individual progress
         print(f"Finished Process")
 
     threading.Thread(target=download_links, daemon=True).start()  # Run in background
@@ -201,7 +177,8 @@ buttons = [
     ("Home", None),
     ("Search", lambda: webbrowser.open("https://music.youtube.com/")),
     ("Downloads", lambda: os.path.join(BASE_DIR, "music")),
-    ("Drag & Drop", open_drag_and_drop_window)
+    ("Drag & Drop", open_drag_and_drop_window),
+    ("Clean Up Library", lambda: threading.Thread(target=clean_up_music_folder, daemon=True).start())
 ]
 
 for btn_text, command in buttons:
@@ -243,8 +220,25 @@ def update_terminal():
         terminal.insert(tk.END, text)
         terminal.yview(tk.END)
         terminal.config(state=tk.DISABLED)
+    drain_ui_updates()  # Apply progress updates queued by the download workers
     root.after(100, update_terminal)  # Check again in 100ms
 
 
+def on_close():
+    # Closing straight away would kill the daemon workers in the middle of writing a file,
+    # so drop the queued tracks, let the ones in flight finish, then quit from the Tk thread
+    if getattr(on_close, "closing", False):
+        return
+    on_close.closing = True
+    print("Closing: finishing the tracks in progress...")
+
+    def shut_down():
+        cancel_active_sessions()
+        run_on_ui(root.quit)
+
+    threading.Thread(target=shut_down, daemon=True).start()
+
+
+root.protocol("WM_DELETE_WINDOW", on_close)
 root.after(100, update_terminal)
 root.mainloop()
@@ -4,8 +4,10 @@ from embed_metadata import embed_metadata
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, APIC
 import inspect
+import threading
 from PIL import Image
 from io import BytesIO
+from library_index import get_library_index
 
 
 def embed_album_art(new_file_path, relevant_file):
@@ -76,6 +78,9 @@ def get_mp3_metadata(file_path):
         print(f"Error reading metadata from {file_path}: {e}")
         return None, None, None, None, None, None, None, 0, False, 'N/A', '', 'Unknown'
 
+# Files created further apart than this are never considered related (see calculate_confidence)
+relevant_window_seconds = 60
+
 # Function to calculate the confidence score based on the date difference and metadata similarity
 def calculate_confidence(current_date, creation_date, album, current_album, artist, current_artist, current_title, empty_title):
 
@@ -103,7 +108,27 @@ def calculate_confidence(current_date, creation_date, album, current_album, arti
 
 
 
-def has_valid_album_art(file_path):
+# Result of the image check per cover art hash; every track of an album shares one cover
+album_art_validity = {}
+album_art_validity_lock = threading.Lock()
+
+
+def has_valid_album_art(file_path, art_hash=None):
+    # With the hash of the file's cover (from the library index) the decode only happens once per image
+    if art_hash is not None:
+        with album_art_validity_lock:
+            if art_hash in album_art_validity:
+                return album_art_validity[art_hash]
+
+        valid = check_album_art(file_path)
+        with album_art_validity_lock:
+            album_art_validity[art_hash] = valid
+        return valid
+
+    return check_album_art(file_path)
+
+
+def check_album_art(file_path):
     try:
         audio = MP3(file_path, ID3=ID3)
         for tag in audio.tags.values():
@@ -133,25 +158,23 @@ def find_relevant_mp3(new_file_path, music_folder):
      new_explicit, new_isrc, new_album_art_url, new_album_genre) = new_metadata
 
     relevant_files = []
-    for file_name in os.listdir(music_folder):
-        file_path = os.path.join(music_folder, file_name)
-        if os.path.isfile(file_path) and file_path.endswith('.mp3'):
-            metadata = get_mp3_metadata(file_path)
-            if not metadata or not metadata[0]:
-                continue
-
-            (creation_date, title, artist, album, release_date,
-             duration_ms, track_number, disc_number, popularity,
-             explicit, isrc, album_art_url, album_genre) = metadata
-
-            confidence = calculate_confidence(
-                new_creation_date, creation_date,
-                album, new_album,
-                artist, new_artist,
-                title, new_title
-            )
-            if confidence > 0 and has_valid_album_art(file_path):
-                relevant_files.append((file_path, confidence))
+    # Only files created within a minute of the new one can score, so ask the index for just that window
+    window_start = new_creation_date - relevant_window_seconds
+    window_end = new_creation_date + relevant_window_seconds
+    for entry in get_library_index().files_created_between(music_folder, window_start, window_end):
+        file_path = entry['path']
+        if os.path.abspath(file_path) == os.path.abspath(new_file_path):
+            continue
+
+        confidence = calculate_confidence(
+            new_creation_date, entry['ctime'],
+            entry['album'] or 'Unknown Album', new_album,
+            entry['artist'] or 'Unknown Artist', new_artist,
+            entry['title'] or 'Unknown Title', new_title
+        )
+        # Files without any cover art can never qualify
+        if confidence > 0 and entry['art_hash'] and has_valid_album_art(file_path, entry['art_hash']):
+            relevant_files.append((file_path, confidence))
 
     if not relevant_files:
         return None
@@ -192,6 +215,7 @@ def save_metadata_from_relevant_file(new_file_path, music_folder):
         # Pass the modified metadata to embed_metadata
         embed_metadata(new_file_path, *metadata)
         embed_album_art(new_file_path, relevant_file)
+        get_library_index().update_file(new_file_path)
 
     else:
         print("No relevant file found. Proceeding with default metadata saving.")
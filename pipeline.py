@@ -0,0 +1,113 @@
+import queue
+import threading
+
+# Put on a stage's queue to tell one of its workers to exit
+STOP = object()
+
+
+class Stage:
+    """One step of a Pipeline: a function run by `workers` threads at once."""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages, each with its own worker threads.
+
+    Stages are joined by bounded queues, so when a stage falls behind the
+    stages before it block instead of piling up work (backpressure), and
+    submit() blocks once the first stage is full.
+
+    A stage function takes an item and returns the item for the next stage,
+    or None to drop it. Items leaving the last stage go to on_done, dropped
+    items to on_dropped and items whose stage raised to on_error.
+    """
+
+    def __init__(self, stages, queue_size=4, on_done=None, on_dropped=None, on_error=None):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.on_done = on_done
+        self.on_dropped = on_dropped
+        self.on_error = on_error
+
+        self.threads = []
+        self.remaining_workers = [stage.workers for stage in stages]
+        self.lock = threading.Lock()
+        self.closed = False
+        self.cancelled = threading.Event()
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for number in range(stage.workers):
+                thread = threading.Thread(target=self.worker, args=(index,), name=f"{stage.name}-{number + 1}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        return self
+
+    def submit(self, item):
+        if self.closed:
+            raise RuntimeError("Cannot submit to a closed pipeline.")
+        self.queues[0].put(item)  # Blocks while the first stage is backed up
+
+    def close(self):
+        """Stops accepting items and waits until everything already submitted has finished."""
+        if not self.closed:
+            self.closed = True
+            for _ in range(self.stages[0].workers):
+                self.queues[0].put(STOP)
+        # Every caller waits, so cancel() still blocks if close() was already called elsewhere
+        for thread in self.threads:
+            thread.join()
+
+    def cancel(self):
+        """Drops everything still queued, lets in-flight items finish and shuts down."""
+        self.cancelled.set()
+        self.close()
+
+    def worker(self, index):
+        stage = self.stages[index]
+        is_last = index == len(self.stages) - 1
+
+        while True:
+            item = self.queues[index].get()
+            if item is STOP:
+                break
+
+            if self.cancelled.is_set():
+                self.notify(self.on_dropped, item)
+                continue
+
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                print(f"❌ {stage.name} stage failed: {e}")
+                self.notify(self.on_error, item, stage.name, e)
+                continue
+
+            if result is None:
+                self.notify(self.on_dropped, item)
+            elif is_last:
+                self.notify(self.on_done, result)
+            else:
+                self.queues[index + 1].put(result)
+
+        # The last worker out of this stage passes the shutdown on to the next one
+        with self.lock:
+            self.remaining_workers[index] -= 1
+            last_out = self.remaining_workers[index] == 0
+
+        if last_out and not is_last:
+            for _ in range(self.stages[index + 1].workers):
+                self.queues[index + 1].put(STOP)
+
+    def notify(self, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"❌ Pipeline callback failed: {e}")
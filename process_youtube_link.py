@@ -2,15 +2,16 @@ import json
 import os
 import sys
 import yt_dlp
-from download_song import download_song_with_metadata
-import time
+from download_pool import DownloadSession
 from fix_album_artist import process_folder
 from mp3_metadata_helper import save_metadata_from_relevant_file
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, error
 from cleanup_tool import cleanup_main
 from sort_albums import process_music_folder
-from spotify_to_youtube import spotify_to_youtube_main
+from library_index import get_library_index
+from spotify_to_youtube import cached_resolution, resolve_if_spotify
+from resolution_cache import youtube_link
 
 # Determine the correct base directory
 if getattr(sys, 'frozen', False):  # Running as a PyInstaller executable
@@ -56,8 +57,6 @@ def get_video_urls_from_playlist(yt_link):
             print(f"Error extracting info from YouTube link: {e}")
             return []
 
-import time
-
 # Function to load proxies from the config file
 def load_proxies():
     try:
@@ -81,74 +80,63 @@ def get_spotify_links(album_link):
     return ["https://open.spotify.com/track/xyz123", "https://open.spotify.com/track/abc456"]
 
 
-def inspect_link(url, progress_bar, progress_label):
+def inspect_link(url, progress_bar, progress_label, session=None):
+    """
+    Queues every track behind the link on a DownloadSession.
+    With no session given, the link gets its own session, which is waited on
+    and followed by the library clean-up. Callers that pass a session (the
+    drag-and-drop batch) close it and clean up themselves.
+    """
+    own_session = session is None
+    if own_session:
+        session = DownloadSession(config, proxies, progress_bar, progress_label)
+
     if "open.spotify.com" in url:
-        spotify_urls = handle_spotify_link(url)
-        index = 0
-        total = len(spotify_urls)
-        for url in spotify_urls:
-            new_url = spotify_to_youtube_main(url)
-            if len(proxies) > 0:
-                    current_proxy = proxies[(index // 5) % len(proxies)]
+        # Tracks resolved on an earlier run go straight to the download, without any resolution work
+        track_urls = []
+        for spotify_url in handle_spotify_link(url):
+            cached = cached_resolution(spotify_url)
+            if cached is None:
+                track_urls.append(spotify_url)
+            elif cached['video_id']:
+                track_urls.append(youtube_link(cached['video_id']))
             else:
-                print("No proxies available!")
-                current_proxy = None  # Or set to a default proxy, if available
-
-            # Print the current proxy (for debugging)
-            print(f"Using proxy: {current_proxy}")
-
-            # Update song count label
-            progress_label.config(text=f"Song: {index + 1} / {total}")
+                print(f"❌ No YouTube match was found for {spotify_url} last time, skipping.")
 
-            # Update the proxy in your downloader function (assuming download_song_with_metadata accepts a proxy)
-            download_song_with_metadata(new_url, (index + 1), current_proxy, total)
-
-            # Update progress bar
-            speed = 1  # Adjust based on your logic
-            if index < total:
-                time.sleep(0.05)
-                progress_bar['value'] += (speed / total) * 100
-
-            index += 1
+        session.submit(track_urls, resolve_url=resolve_if_spotify)
     else:
         video_urls = get_video_urls_from_playlist(url)
         
         if video_urls:
             print("Video URLs:", video_urls)
-            index = 0
-            total = len(video_urls)
-            for url in video_urls:
-                if len(proxies) > 0:
-                    current_proxy = proxies[(index // 5) % len(proxies)]
-                else:
-                    print("No proxies available!")
-                    current_proxy = None  # Or set to a default proxy, if available
-
-                # Print the current proxy (for debugging)
-                print(f"Using proxy: {current_proxy}")
-
-                # Update song count label
-                progress_label.config(text=f"Song: {index + 1} / {total}")
-
-                # Update the proxy in your downloader function (assuming download_song_with_metadata accepts a proxy)
-                download_song_with_metadata(url, (index + 1), current_proxy, total)
-
-                # Update progress bar
-                speed = 1  # Adjust based on your logic
-                if index < total:
-                    time.sleep(0.05)
-                    progress_bar['value'] += (speed / total) * 100
-
-                index += 1
-            
-            # This will now only run once after the loop completes
-            #cleanUpTool()
-
         else:
             print("No video URLs extracted.")
-            download_song_with_metadata(url, 1, 1)
-
-    # Clean up after this download attempt
-    process_music_folder(music_path)
-    cleanup_main(music_path)
-    
\ No newline at end of file
+            video_urls = [url]
+
+        session.submit(video_urls)
+
+    if own_session:
+        finished = session.close()
+        if session.cancelled:
+            return
+        clean_up_music_folder([job['final_path'] for job in finished if job.get('final_path')])
+
+
+def clean_up_music_folder(files=None):
+    """
+    Renumbers tracks and fixes album art. After a download only the albums of
+    the new files are touched; with files=None the whole library is swept.
+    """
+    if files is not None and not files:
+        print("Nothing new in the music folder, skipping clean up.")
+        return
+
+    # One refresh and one read of the index, shared by both passes. After a download the
+    # session's start-up refresh and its per-file updates have already brought it up to date.
+    index = get_library_index()
+    if files is None:
+        index.refresh(music_path)
+    entries = index.files(music_path, recursive=True, refresh=False)
+
+    process_music_folder(music_path, files, entries=entries)
+    cleanup_main(music_path, files, entries=entries)
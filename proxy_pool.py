@@ -0,0 +1,202 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Assumed for proxies we have no measurements for yet, so untried proxies get a fair chance
+default_latency = 1.0  # Seconds per request
+default_throughput = 1024 * 1024  # Bytes per second
+
+
+class ProxyStats:
+    """Running measurements for one proxy. Averages are exponentially weighted towards recent jobs."""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.bytes_transferred = 0
+        self.latency = None
+        self.throughput = None
+        self.error_rate = 0.0
+        self.open_until = 0  # Circuit open (proxy not used) until this time
+        self.trips = 0
+
+    def as_dict(self):
+        return {
+            "proxy": self.proxy,
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 3),
+            "latency": round(self.latency, 2) if self.latency is not None else None,
+            "throughput": round(self.throughput) if self.throughput is not None else None,
+            "bytes_transferred": self.bytes_transferred,
+            "circuit_open": self.open_until > time.time(),
+        }
+
+
+class ProxyLease:
+    """Handed to the caller of ProxyPool.lease(); say how the job went with fail() or transferred()."""
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.failed = False
+        self.bytes = 0
+
+    def fail(self):
+        self.failed = True
+
+    def transferred(self, byte_count):
+        self.bytes += byte_count
+
+
+class ProxyPool:
+    """
+    Routes each request to the proxy that is currently doing best.
+
+    Every lease reports its latency, bytes moved and whether it failed. A
+    proxy is scored on its recent latency, throughput, error rate and how
+    many jobs it is already running, and the cheapest one with a free slot
+    wins. After failure_threshold failures in a row a proxy's circuit opens
+    and it rests for cool_down seconds (doubling on every repeat trip, up to
+    max_cool_down); afterwards a single trial job decides whether it is back.
+    """
+
+    def __init__(self, proxies, max_per_proxy=2, failure_threshold=3, cool_down=60, max_cool_down=900, smoothing=0.3):
+        self.max_per_proxy = max(1, int(max_per_proxy))
+        self.failure_threshold = failure_threshold
+        self.cool_down = cool_down
+        self.max_cool_down = max_cool_down
+        self.smoothing = smoothing
+
+        self.stats = {proxy: ProxyStats(proxy) for proxy in proxies}
+        self.condition = threading.Condition()
+
+    def cost(self, stats):
+        latency = stats.latency if stats.latency is not None else default_latency
+        throughput = stats.throughput if stats.throughput is not None else default_throughput
+        seconds_per_job = latency + (1024 * 1024) / max(throughput, 1)
+        return seconds_per_job * (1 + 4 * stats.error_rate) * (1 + stats.in_flight)
+
+    def is_half_open_busy(self, stats):
+        # Back from a cool-down but not yet proven: its single trial job is still running
+        return bool(stats.trips and stats.consecutive_failures and stats.in_flight)
+
+    def pick(self, now):
+        """The best proxy that can take a job right now, or None if every usable one is busy."""
+        closed, resting = [], []
+        for stats in self.stats.values():
+            if stats.in_flight >= self.max_per_proxy:
+                continue
+            if stats.open_until > now:
+                resting.append(stats)
+            elif not self.is_half_open_busy(stats):
+                closed.append(stats)
+
+        if closed:
+            return min(closed, key=self.cost)
+
+        # Every proxy is resting; rather than stall, try the one closest to the end of its cool-down
+        if resting and not any(stats.in_flight for stats in self.stats.values()):
+            return min(resting, key=lambda stats: stats.open_until)
+        return None
+
+    def acquire(self, preferred=None):
+        with self.condition:
+            while True:
+                now = time.time()
+                stats = self.stats.get(preferred)
+                if stats is None or stats.open_until > now:
+                    stats = self.pick(now)  # No preference, or the preferred proxy is resting
+                elif stats.in_flight >= self.max_per_proxy or self.is_half_open_busy(stats):
+                    stats = None
+
+                if stats:
+                    stats.in_flight += 1
+                    return stats
+                self.condition.wait(timeout=1)  # Also wakes up to notice cool-downs ending
+
+    @contextmanager
+    def lease(self, preferred=None):
+        """
+        Yields a ProxyLease for the best available proxy (lease.proxy is None with no proxies).
+        With preferred, waits for that proxy unless its circuit is open.
+        """
+        if not self.stats:
+            yield ProxyLease(None)
+            return
+
+        stats = self.acquire(preferred)
+        lease = ProxyLease(stats.proxy)
+        started = time.time()
+        try:
+            yield lease
+        except Exception:
+            lease.fail()
+            raise
+        finally:
+            self.report(stats, lease, time.time() - started)
+
+    def report(self, stats, lease, elapsed):
+        alpha = self.smoothing
+        with self.condition:
+            stats.in_flight -= 1
+
+            if lease.failed:
+                stats.failures += 1
+                stats.consecutive_failures += 1
+                stats.error_rate = (1 - alpha) * stats.error_rate + alpha
+                if stats.consecutive_failures >= self.failure_threshold:
+                    rest = min(self.cool_down * 2 ** stats.trips, self.max_cool_down)
+                    stats.open_until = time.time() + rest
+                    stats.trips += 1
+                    print(f"🚫 Proxy {stats.proxy} failed {stats.consecutive_failures} times in a row, resting it for {rest}s.")
+            else:
+                stats.successes += 1
+                stats.consecutive_failures = 0
+                stats.trips = 0
+                stats.error_rate = (1 - alpha) * stats.error_rate
+                if lease.bytes:
+                    stats.bytes_transferred += lease.bytes
+                    speed = lease.bytes / max(elapsed, 0.001)
+                    stats.throughput = speed if stats.throughput is None else (1 - alpha) * stats.throughput + alpha * speed
+                else:
+                    stats.latency = elapsed if stats.latency is None else (1 - alpha) * stats.latency + alpha * elapsed
+
+            self.condition.notify_all()
+
+    def snapshot(self):
+        """Per-proxy stats, best first."""
+        with self.condition:
+            ranked = sorted(self.stats.values(), key=self.cost)
+            return [stats.as_dict() for stats in ranked]
+
+    def print_stats(self):
+        for stats in self.snapshot():
+            latency = f"{stats['latency']}s" if stats['latency'] is not None else "n/a"
+            throughput = f"{stats['throughput'] / 1024:.0f} KiB/s" if stats['throughput'] is not None else "n/a"
+            state = "resting" if stats['circuit_open'] else "ok"
+            print(f"Proxy {stats['proxy']}: {stats['successes']} ok, {stats['failures']} failed, "
+                  f"latency {latency}, throughput {throughput}, {state}")
+
+
+proxy_pool = None
+proxy_pool_lock = threading.Lock()
+
+
+def get_proxy_pool(proxies, config):
+    """Returns the shared ProxyPool, so what we learn about each proxy carries over between sessions."""
+    global proxy_pool
+    with proxy_pool_lock:
+        if proxy_pool is None or set(proxy_pool.stats) != set(proxies):
+            proxy_config = config.get('proxy_pool', {})
+            proxy_pool = ProxyPool(
+                proxies,
+                max_per_proxy=config.get('max_downloads_per_proxy', 2),
+                failure_threshold=proxy_config.get('failure_threshold', 3),
+                cool_down=proxy_config.get('cool_down_seconds', 60),
+                max_cool_down=proxy_config.get('max_cool_down_seconds', 900)
+            )
+        return proxy_pool
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import threading
+from email.utils import parsedate_to_datetime
+from file_lock import file_lock
+from storage import cache_dir, config_path
+
+rate_limit_dir = os.path.join(cache_dir(), "rate_limits")
+
+# Requests per second and burst size for each provider; override with config.json "rate_limits"
+default_rate_limits = {
+    "spotify": {"rate": 10, "burst": 10},
+    "musicbrainz": {"rate": 1, "burst": 1},  # MusicBrainz blocks clients going over 1 request per second
+    "coverartarchive": {"rate": 5, "burst": 5},
+    "openai": {"rate": 3, "burst": 5},
+}
+
+
+def parse_retry_after(value, default=1.0):
+    """Seconds to wait from a Retry-After header, which is either a number of seconds or an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """
+    Token bucket for one API provider, shared by every thread and process.
+
+    The bucket (tokens left, last refill, and any Retry-After pause) lives in
+    a small state file under cache/rate_limits, updated under file_lock, so
+    all workers and any other running copy of the app draw from the same
+    budget. acquire() blocks until a token is free; block() pauses everyone
+    after a 429. Time spent waiting is counted for stats().
+    """
+
+    def __init__(self, provider, rate, burst, state_dir=rate_limit_dir):
+        self.provider = provider
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.state_path = os.path.join(state_dir, f"{provider}.json")
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.waited_requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.throttled = 0
+
+    def read_state(self, now):
+        try:
+            with open(self.state_path, "r") as state_file:
+                return json.load(state_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"tokens": self.burst, "updated": now, "blocked_until": 0}
+
+    def write_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as state_file:
+            json.dump(state, state_file)
+        os.replace(temp_path, self.state_path)
+
+    def try_take(self):
+        """Takes a token if one is free. Returns 0, or how long to wait before trying again."""
+        with self.lock, file_lock(self.state_path):
+            now = time.time()
+            state = self.read_state(now)
+            state["tokens"] = min(self.burst, state["tokens"] + (now - state["updated"]) * self.rate)
+            state["updated"] = now
+
+            wait = 0.0
+            if state["blocked_until"] > now:
+                wait = state["blocked_until"] - now
+            elif state["tokens"] >= 1:
+                state["tokens"] -= 1
+            else:
+                wait = (1 - state["tokens"]) / self.rate
+
+            self.write_state(state)
+            return wait
+
+    def acquire(self):
+        started = time.time()
+        while True:
+            wait = self.try_take()
+            if not wait:
+                break
+            time.sleep(wait)
+
+        waited = time.time() - started
+        with self.lock:
+            self.requests += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if waited > 0.01:
+                self.waited_requests += 1
+
+    def block(self, seconds):
+        """Holds back every caller for `seconds`, e.g. from a Retry-After header."""
+        with self.lock, file_lock(self.state_path):
+            now = time.time()
+            state = self.read_state(now)
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+            self.write_state(state)
+            self.throttled += 1
+        print(f"⏳ {self.provider} asked us to slow down, pausing its requests for {seconds:.1f}s.")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "provider": self.provider,
+                "requests": self.requests,
+                "waited_requests": self.waited_requests,
+                "total_wait": round(self.total_wait, 2),
+                "average_wait": round(self.total_wait / self.requests, 3) if self.requests else 0.0,
+                "max_wait": round(self.max_wait, 2),
+                "throttled": self.throttled,
+            }
+
+
+def rate_limited_request(provider, send, max_retries=3, retry_statuses=(429, 503)):
+    """
+    Calls send() (which returns a requests.Response) once the provider's limiter allows it.
+    A 429/503 pauses the provider for its Retry-After and retries, up to max_retries times.
+    """
+    limiter = get_rate_limiter(provider)
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        response = send()
+        if response.status_code not in retry_statuses or attempt == max_retries:
+            return response
+        limiter.block(parse_retry_after(response.headers.get("Retry-After"), default=2 ** attempt))
+    return response
+
+
+rate_limiters = {}
+rate_limiters_lock = threading.Lock()
+
+
+def load_rate_limits():
+    limits = {provider: dict(limit) for provider, limit in default_rate_limits.items()}
+    try:
+        with open(config_path, "r") as config_file:
+            for provider, limit in json.load(config_file).get("rate_limits", {}).items():
+                limits.setdefault(provider, {"rate": 1, "burst": 1}).update(limit)
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return limits
+
+
+def get_rate_limiter(provider):
+    """Returns the shared RateLimiter for a provider, creating it on first use."""
+    with rate_limiters_lock:
+        if provider not in rate_limiters:
+            limit = load_rate_limits().get(provider, {"rate": 1, "burst": 1})
+            rate_limiters[provider] = RateLimiter(provider, limit["rate"], limit["burst"])
+        return rate_limiters[provider]
+
+
+def rate_limit_stats():
+    """Queue-wait metrics for every provider used so far in this process."""
+    with rate_limiters_lock:
+        limiters = list(rate_limiters.values())
+    return [limiter.stats() for limiter in limiters]
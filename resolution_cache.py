@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import sqlite3
+from storage import cache_dir, config_path, connect_sqlite, shared_instance
+
+resolution_cache_path = os.path.join(cache_dir(), "spotify_youtube.sqlite")
+
+
+def youtube_link(video_id):
+    return f"https://www.youtube.com/watch?v={video_id}"
+
+
+class ResolutionCache:
+    """
+    SQLite cache of Spotify track -> YouTube video resolutions.
+
+    Entries are keyed by Spotify track ID and also indexed by ISRC, so the
+    same recording on another album or compilation is found too. Failed
+    resolutions are stored with no video ID and expire after the shorter
+    negative_ttl_seconds, so a track that can't be found isn't searched for
+    on every run but gets retried eventually.
+    """
+
+    def __init__(self, path=resolution_cache_path, ttl_seconds=90 * 24 * 3600, negative_ttl_seconds=24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS resolutions (
+                    spotify_id TEXT PRIMARY KEY,
+                    isrc TEXT,
+                    video_id TEXT,
+                    confidence REAL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS resolutions_isrc ON resolutions (isrc)")
+
+    def connect(self):
+        return connect_sqlite(self.path, row_factory=sqlite3.Row)
+
+    def is_fresh(self, row, now):
+        ttl = self.ttl_seconds if row["video_id"] else self.negative_ttl_seconds
+        return now - row["created_at"] <= ttl
+
+    def get(self, spotify_id=None, isrc=None):
+        """
+        Returns the cached resolution as a dict, or None on a miss.
+        A dict whose video_id is None is a cached failure.
+        """
+        now = time.time()
+        with self.connect() as conn:
+            if spotify_id:
+                row = conn.execute("SELECT * FROM resolutions WHERE spotify_id = ?", (spotify_id,)).fetchone()
+                if row and self.is_fresh(row, now):
+                    return dict(row)
+
+            if isrc:
+                # Only successes are shared between Spotify IDs; a failure for one release says little about another
+                rows = conn.execute(
+                    "SELECT * FROM resolutions WHERE isrc = ? AND video_id IS NOT NULL ORDER BY confidence DESC", (isrc,)
+                ).fetchall()
+                for row in rows:
+                    if self.is_fresh(row, now):
+                        return dict(row)
+
+        return None
+
+    def put(self, spotify_id, video_id, confidence=None, isrc=None):
+        """Stores a resolution; pass video_id=None to remember a failure."""
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO resolutions (spotify_id, isrc, video_id, confidence, created_at) VALUES (?, ?, ?, ?, ?)",
+                (spotify_id, isrc, video_id, confidence, time.time())
+            )
+
+    def forget(self, spotify_id):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM resolutions WHERE spotify_id = ?", (spotify_id,))
+
+
+def load_cache_config():
+    try:
+        with open(config_path, "r") as config_file:
+            return json.load(config_file).get("resolution_cache", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def create_resolution_cache():
+    cache_config = load_cache_config()
+    return ResolutionCache(
+        ttl_seconds=cache_config.get("ttl_days", 90) * 24 * 3600,
+        negative_ttl_seconds=cache_config.get("negative_ttl_hours", 24) * 3600
+    )
+
+
+get_resolution_cache = shared_instance(create_resolution_cache)
@@ -1,79 +1,147 @@
 import os
 import mutagen
 from mutagen.easyid3 import EasyID3
-from datetime import datetime
+from library_index import get_library_index
 
 # Define keywords for special editions
 special_keywords = ["Deluxe", "Expanded", "Remastered", "Special Edition", "Anniversary"]
 
-def find_deluxe_albums(music_folder):
+def find_deluxe_albums(music_folder, entries=None):
     """
     Scans the folder to find deluxe/special editions of albums.
     Returns a mapping of base album names to their deluxe versions.
     """
     album_mapping = {}
 
-    for filename in os.listdir(music_folder):
-        if filename.endswith(".mp3"):
-            file_path = os.path.join(music_folder, filename)
-            try:
-                audio = EasyID3(file_path)
-                album = audio.get("album", [""])[0]
+    if entries is None:
+        entries = get_library_index().files(music_folder)
 
-                if any(keyword.lower() in album.lower() for keyword in special_keywords):
-                    base_album = album.split(" (")[0].strip()
-                    album_mapping[base_album] = album
+    for entry in entries:
+        album = entry['album'] or ""
 
-            except mutagen.MutagenError:
-                print(f"Skipping: {filename} (Invalid MP3 metadata)")
+        if any(keyword.lower() in album.lower() for keyword in special_keywords):
+            base_album = album.split(" (")[0].strip()
+            album_mapping[base_album] = album
 
     return album_mapping
 
-def update_album_metadata(music_folder, album_mapping):
+def touched_albums(entries, files, album_mapping):
     """
-    Updates the album metadata of standard versions to their deluxe counterparts.
-    Also reorders track numbers based on creation date.
+    Album names the given files belong to, plus their standard/deluxe counterparts,
+    since merging one into the other renumbers both.
+    """
+    files = {os.path.abspath(path) for path in files}
+    albums = {entry['album'] or "" for entry in entries if entry['path'] in files}
+    albums |= {album_mapping[album] for album in albums if album in album_mapping}
+    albums |= {base for base, deluxe in album_mapping.items() if deluxe in albums}
+    return albums
+
+
+def plan_album_changes(entries, album_mapping, albums_to_update=None):
+    """
+    Works out, in memory, which tags need to change: standard versions are merged
+    into their deluxe counterparts and every album is renumbered by creation date.
+    Returns {file_path: {tag: new_value}} holding only the values that differ.
     """
     album_tracks = {}
 
-    # First pass: Collect files and their creation timestamps
-    for filename in os.listdir(music_folder):
-        if filename.endswith(".mp3"):
-            file_path = os.path.join(music_folder, filename)
-            try:
-                audio = EasyID3(file_path)
-                album = audio.get("album", [""])[0]
-                track_num = int(audio.get("tracknumber", ["0"])[0].split("/")[0])
-
-                # Check if album should be updated
-                if album in album_mapping:
-                    album = album_mapping[album]
-                    audio["album"] = album
-                    audio.save()
-
-                # Store track info
-                creation_time = os.path.getctime(file_path)  # Get file creation time
-                album_tracks.setdefault(album, []).append((file_path, creation_time))
-
-            except (mutagen.MutagenError, ValueError):
-                print(f"Error processing: {filename}")
-
-    # Second pass: Sort and update track numbers sequentially
+    for entry in entries:
+        album = entry['album'] or ""
+        if albums_to_update is not None and album not in albums_to_update:
+            continue
+
+        target_album = album_mapping.get(album, album)
+        album_tracks.setdefault(target_album, []).append(entry)
+
+    changes = {}
     for album, tracks in album_tracks.items():
-        tracks.sort(key=lambda x: x[1])  # Sort by creation date
-        for index, (file_path, _) in enumerate(tracks, start=1):
-            try:
-                audio = EasyID3(file_path)
-                audio["tracknumber"] = str(index)  # Sequential track numbering
-                audio.save()
-                print(f"Updated track {index} for album '{album}' in file {os.path.basename(file_path)}")
+        tracks.sort(key=lambda entry: entry['ctime'])  # Sort by creation date
+        for index, entry in enumerate(tracks, start=1):
+            new_tags = {}
+            if (entry['album'] or "") != album:
+                new_tags['album'] = album
+            if entry['track_number'] != str(index):  # Sequential track numbering
+                new_tags['tracknumber'] = str(index)
+
+            if new_tags:
+                changes[entry['path']] = new_tags
+
+    return changes
+
+
+def apply_album_changes(changes):
+    """Writes each changed file once and returns the paths that were written."""
+    written = []
+
+    for file_path, new_tags in changes.items():
+        try:
+            audio = EasyID3(file_path)
+            for key, value in new_tags.items():
+                audio[key] = value
+            audio.save()
+            written.append(file_path)
+            print(f"Updated {', '.join(f'{key}={value}' for key, value in new_tags.items())} in file {os.path.basename(file_path)}")
+
+        except mutagen.MutagenError:
+            print(f"Error processing: {os.path.basename(file_path)}")
+
+    get_library_index().update_files(written)
+    return written
 
-            except mutagen.MutagenError:
-                print(f"Failed to update track number for {os.path.basename(file_path)}")
 
+def print_album_changes(changes):
+    if not changes:
+        print("No album metadata changes pending.")
+        return
+
+    print(f"{len(changes)} file(s) would be updated:")
+    for file_path, new_tags in changes.items():
+        print(f"  {os.path.basename(file_path)}: {', '.join(f'{key} -> {value}' for key, value in new_tags.items())}")
+
+
+def update_album_metadata(music_folder, album_mapping, files=None, dry_run=False, entries=None):
+    """
+    Updates the album metadata of standard versions to their deluxe counterparts.
+    Also reorders track numbers based on creation date.
+    With files given, only the albums those files belong to are touched.
+    With dry_run, the pending changes are only reported.
+    """
+    # Tags and creation times come from the library index, so no file is opened unless it changes
+    if entries is None:
+        entries = get_library_index().files(music_folder)
+    albums_to_update = touched_albums(entries, files, album_mapping) if files is not None else None
+
+    changes = plan_album_changes(entries, album_mapping, albums_to_update)
+    if dry_run:
+        print_album_changes(changes)
+    else:
+        apply_album_changes(changes)
+
+    return changes
+
+
+def apply_to_entries(entries, changes):
+    """Mirrors written changes onto the index rows, so later passes see the new albums and numbers."""
+    for entry in entries:
+        new_tags = changes.get(entry['path'])
+        if new_tags:
+            entry['album'] = new_tags.get('album', entry['album'])
+            entry['track_number'] = new_tags.get('tracknumber', entry['track_number'])
+
+
+def process_music_folder(music_folder, files=None, dry_run=False, entries=None):
+    """
+    Runs over the whole folder, or only the albums of `files` (e.g. the tracks just downloaded).
+    entries are the folder's index rows if the caller already has them; they are updated in place.
+    """
+    if entries is None:
+        entries = get_library_index().files(music_folder)
+    album_map = find_deluxe_albums(music_folder, entries)
+    changes = update_album_metadata(music_folder, album_map, files, dry_run, entries)
 
-def process_music_folder(music_folder):
-    album_map = find_deluxe_albums(music_folder)
-    update_album_metadata(music_folder, album_map)
+    if dry_run:
+        return changes
 
-    print("Album metadata and track numbering update complete!")
+    apply_to_entries(entries, changes)
+    print(f"Album metadata and track numbering update complete! ({len(changes)} file(s) changed)")
+    return changes
@@ -0,0 +1,113 @@
+import re
+import threading
+import urllib.parse
+from difflib import SequenceMatcher
+
+# Spotify's /tracks endpoint accepts at most 50 IDs per call
+tracks_batch_size = 50
+
+
+def normalize_text(text):
+    """Lowercases and strips the decorations that differ between YouTube and Spotify titles."""
+    text = str(text or "").lower()
+    text = re.sub(r'\((feat|ft|with)\.?[^)]*\)|\[(feat|ft|with)\.?[^\]]*\]', '', text)  # Featured artists
+    text = re.sub(r'\s-\s.*(remaster|version|edit|mix).*$', '', text)  # "- Remastered 2011" style suffixes
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return " ".join(text.split())
+
+
+def similarity(a, b):
+    return SequenceMatcher(None, normalize_text(a), normalize_text(b)).ratio()
+
+
+class SpotifyAlbumResolver:
+    """
+    Resolves tracks against whole Spotify albums instead of one search per track.
+
+    The first track of an album costs one album search plus a few bulk
+    tracklist calls; every other track of that album is matched locally
+    against the cached tracklist by title, track number and duration.
+    """
+
+    def __init__(self, token_provider, min_score=0.6, min_title_similarity=0.5):
+        self.token_provider = token_provider
+        self.min_score = min_score
+        self.min_title_similarity = min_title_similarity  # Track number and duration alone can't make a match
+        self.albums = {}  # (artist, album) -> list of full track objects, or None if not found
+        self.album_locks = {}
+        self.lock = threading.Lock()
+
+    def get_album_tracks(self, artist, album):
+        key = (normalize_text(artist), normalize_text(album))
+
+        # One lock per album so concurrent tracks of the same album wait for a single lookup
+        with self.lock:
+            album_lock = self.album_locks.setdefault(key, threading.Lock())
+
+        with album_lock:
+            if key not in self.albums:
+                self.albums[key] = self.fetch_album_tracks(artist, album)
+            return self.albums[key]
+
+    def fetch_album_tracks(self, artist, album):
+        album_id = self.search_album(artist, album)
+        if not album_id:
+            print(f"No Spotify album found for {artist} - {album}")
+            return None
+
+        track_ids = []
+        next_url = f'https://api.spotify.com/v1/albums/{album_id}/tracks?limit=50'
+        while next_url:
+            page = self.token_provider.get(next_url).json()
+            track_ids.extend(item['id'] for item in page.get('items', []) if item.get('id'))
+            next_url = page.get('next')
+
+        # The album tracklist is simplified; the full objects carry the ISRC and album details
+        tracks = []
+        for start in range(0, len(track_ids), tracks_batch_size):
+            ids = ",".join(track_ids[start:start + tracks_batch_size])
+            response = self.token_provider.get(f'https://api.spotify.com/v1/tracks?ids={ids}').json()
+            tracks.extend(track for track in response.get('tracks', []) if track)
+
+        print(f"Cached {len(tracks)} Spotify tracks for album {album}")
+        return tracks
+
+    def search_album(self, artist, album):
+        query = f'album:{album} artist:{artist}'
+        search_url = f'https://api.spotify.com/v1/search?q={urllib.parse.quote(query)}&type=album&limit=5'
+        items = self.token_provider.get(search_url).json().get('albums', {}).get('items', [])
+        if not items:
+            return None
+
+        best = max(items, key=lambda item: similarity(item['name'], album))
+        if similarity(best['name'], album) < self.min_score:
+            return None
+        return best['id']
+
+    def match_track(self, artist, album, title, track_number=None, duration=None):
+        """
+        Returns the Spotify track object from the album that best matches, or None.
+        duration is in seconds, as yt-dlp reports it.
+        """
+        tracks = self.get_album_tracks(artist, album)
+        if not tracks:
+            return None
+
+        best_track, best_score = None, 0
+        for track in tracks:
+            score = similarity(track['name'], title)
+            if score < self.min_title_similarity:
+                continue
+            if track_number and str(track.get('track_number')) == str(track_number):
+                score += 0.2
+            if duration:
+                delta = abs(track.get('duration_ms', 0) / 1000 - float(duration))
+                score += 0.2 if delta <= 3 else (-0.2 if delta > 15 else 0)
+
+            if score > best_score:
+                best_track, best_score = track, score
+
+        if best_score < self.min_score:
+            print(f"No confident album match for {title} (best score {best_score:.2f})")
+            return None
+        return best_track
@@ -1,22 +1,18 @@
 import re
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
 from urllib.parse import quote_plus
+from driver_pool import get_driver_pool
+from download_metadata import get_enricher
+from spotify_youtube_resolver import SpotifyYouTubeResolver, parse_spotify_track_id
+from resolution_cache import get_resolution_cache, youtube_link
+from download_song import parse_video_id
+from storage import shared_instance
 
-def setup_chrome_driver():
-    """Set up the Chrome WebDriver with headless options."""
-    options = Options()
-    # options.add_argument('--headless')  # Uncomment to run headless
-    options.add_argument('--disable-gpu')
-    options.add_argument('--window-size=1280,800')
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    return driver
+# The browserless resolver shares the enricher's Spotify token
+get_youtube_resolver = shared_instance(lambda: SpotifyYouTubeResolver(get_enricher().token_provider))
 
 def get_spotify_metadata(driver, url):
     """Fetch track info and album art from a Spotify track page."""
@@ -253,27 +249,83 @@ def find_watch_card_by_title(driver, target_title):
 
 
 # === Example Usage ===
+def cached_resolution(url):
+    """The cached resolution of a Spotify track URL (video_id None for a known failure), or None."""
+    track_id = parse_spotify_track_id(url)
+    return get_resolution_cache().get(track_id) if track_id else None
+
+
+def resolve_if_spotify(url):
+    """resolve_url for batches that mix already-resolved YouTube URLs with Spotify ones."""
+    return spotify_to_youtube_main(url) if "open.spotify.com" in url else url
+
+
 def spotify_to_youtube_main(url):
-    driver = setup_chrome_driver()
-    
-    spotify_url = url
-    metadata = get_spotify_metadata(driver, spotify_url)
-    
-    if metadata:
-        print("✅ Metadata Extracted from Spotify:")
-        print(metadata)
+    cache = get_resolution_cache()
+    track_id = parse_spotify_track_id(url)
+
+    cached = cache.get(track_id) if track_id else None
+    if cached:
+        if cached['video_id']:
+            print(f"✅ Using cached YouTube match for {url}")
+            return youtube_link(cached['video_id'])
+        print(f"❌ No YouTube match was found for {url} last time, skipping.")
+        return None
 
-        # Search YouTube for the song
-        go_to_youtube_search(driver, metadata['title'], metadata['artist'], metadata['album'])
-        
-        # Extract metadata from YouTube search results
-        yt_metadata = extract_youtube_metadata(driver, metadata['title'], metadata['album'], metadata['artist'])
-        
-        if yt_metadata:
-            print("✅ YouTube Metadata Extracted:")
-            print(yt_metadata)
-            return yt_metadata['youtube_link'] 
-    driver.quit()
+    # Spotify Web API + yt-dlp search first; the browser is only the fallback
+    resolver = get_youtube_resolver()
+    spotify_track, match, failed = None, None, False
+    try:
+        spotify_track = resolver.spotify_track(track_id) if track_id else None
+        isrc = spotify_track['isrc'] if spotify_track else None
+
+        # The same recording may already be resolved under another release's track ID
+        cached = cache.get(isrc=isrc) if isrc else None
+        if cached:
+            print(f"✅ Using cached YouTube match for ISRC {isrc}")
+            cache.put(track_id, cached['video_id'], cached['confidence'], isrc)
+            return youtube_link(cached['video_id'])
+
+        match = resolver.resolve_track(spotify_track) if spotify_track else None
+    except Exception as e:
+        print("❌ Browserless resolution failed:", e)
+        failed = True
+
+    if match and match['confidence'] >= resolver.min_confidence:
+        print(f"✅ Matched on YouTube: {match['title']} ({match['channel']}), confidence {match['confidence']:.2f}")
+        link, confidence = match['youtube_link'], match['confidence']
+    else:
+        if match:
+            print(f"Low confidence match ({match['confidence']:.2f}), falling back to the browser...")
+        link, confidence = scrape_spotify_to_youtube(url), None
+
+    video_id = parse_video_id(link)
+    # Don't remember a failure that may only have been a network error
+    if track_id and (video_id or not failed):
+        cache.put(track_id, video_id, confidence, spotify_track['isrc'] if spotify_track else None)
+    return link
+
+
+def scrape_spotify_to_youtube(url):
+    # Borrow a browser from the shared pool; it goes back to the pool however this returns
+    with get_driver_pool().checkout() as driver:
+        spotify_url = url
+        metadata = get_spotify_metadata(driver, spotify_url)
+
+        if metadata:
+            print("✅ Metadata Extracted from Spotify:")
+            print(metadata)
+
+            # Search YouTube for the song
+            go_to_youtube_search(driver, metadata['title'], metadata['artist'], metadata['album'])
+
+            # Extract metadata from YouTube search results
+            yt_metadata = extract_youtube_metadata(driver, metadata['title'], metadata['album'], metadata['artist'])
+
+            if yt_metadata:
+                print("✅ YouTube Metadata Extracted:")
+                print(yt_metadata)
+                return yt_metadata['youtube_link']
 
 
 #main("https://open.spotify.com/track/0SjnBEHZVXgCKvOrpvzL2k")
\ No newline at end of file
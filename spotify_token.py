@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import base64
+import threading
+import requests
+from file_lock import file_lock
+from rate_limiter import rate_limited_request
+from http_session import get_http_session
+from storage import cache_dir
+
+token_cache_path = os.path.join(cache_dir(), "spotify_token.json")
+
+# Spotify token endpoint
+token_url = 'https://accounts.spotify.com/api/token'
+
+# The token file lock is held while minting, and request_access_token can take minutes at worst
+# (5 attempts of up to 10s each plus connection retries and backoff), so waiters and the
+# stale-lock check must allow for that or a second process would mint in parallel
+token_lock_timeout = 300
+
+
+def request_access_token(client_id, client_secret, retries=5, timeout=10):
+    """
+    Fetch a client-credentials token with retry logic.
+    Returns (access_token, expires_in) or (None, 0) if every attempt failed.
+    """
+    # Base64 encode the client_id and client_secret
+    credentials = f"{client_id}:{client_secret}"
+    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
+    headers = {'Authorization': f'Basic {encoded_credentials}'}
+    data = {'grant_type': 'client_credentials'}
+
+    for attempt in range(retries):
+        try:
+            response = get_http_session().post(token_url, headers=headers, data=data, timeout=timeout)
+
+            # If successful, return the token
+            if response.status_code == 200:
+                token_data = response.json()
+                return token_data.get('access_token'), token_data.get('expires_in', 3600)
+
+            print(f"Attempt {attempt + 1} failed: {response.status_code} - {response.text}")
+
+        except requests.exceptions.RequestException as e:
+            print(f"Attempt {attempt + 1} failed due to network error: {e}")
+
+        # Wait before retrying (exponential backoff)
+        wait_time = 2 ** attempt
+        print(f"Retrying in {wait_time} seconds...")
+        time.sleep(wait_time)
+
+    print("Error: Could not retrieve access token after multiple attempts.")
+    return None, 0
+
+
+class SpotifyTokenProvider:
+    """
+    Hands out a Spotify access token, minting a new one only when needed.
+
+    The token and its expiry are cached on disk, so every worker thread and
+    process (and the next run of the app) shares one token. A token is
+    replaced refresh_margin seconds before it expires, and straight away
+    when Spotify rejects it with a 401.
+    """
+
+    def __init__(self, client_id, client_secret, cache_path=token_cache_path, refresh_margin=120):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+
+        self.access_token = None
+        self.expires_at = 0
+        self.lock = threading.Lock()
+
+    def is_fresh(self):
+        return self.access_token and time.time() < self.expires_at - self.refresh_margin
+
+    def get_token(self):
+        if self.is_fresh():
+            return self.access_token
+
+        with self.lock:
+            if self.is_fresh():
+                return self.access_token
+
+            try:
+                with file_lock(self.cache_path, timeout=token_lock_timeout, stale_after=token_lock_timeout):
+                    # Another process may have refreshed the token while we waited
+                    self.load_cache()
+                    if not self.is_fresh():
+                        self.refresh()
+            except TimeoutError:
+                print("Timed out waiting for another process to mint a Spotify token, minting one here.")
+                self.refresh()
+
+            return self.access_token
+
+    def invalidate(self, rejected_token):
+        """Forget a token Spotify refused, so the next get_token() mints a new one."""
+        with self.lock:
+            if self.access_token == rejected_token:
+                self.access_token = None
+                self.expires_at = 0
+
+            try:
+                with file_lock(self.cache_path, timeout=token_lock_timeout, stale_after=token_lock_timeout):
+                    cached = self.read_cache()
+                    if cached.get('access_token') == rejected_token:
+                        self.write_cache({})
+            except TimeoutError:
+                pass  # Whoever holds the lock is minting a replacement anyway
+
+    def get(self, url, **kwargs):
+        """
+        GET a Spotify API URL with the current token, retrying once with a new token on a 401.
+        Calls go through the shared Spotify rate limiter, which also waits out 429 Retry-After pauses.
+        """
+        token = self.get_token()
+        headers = dict(kwargs.pop('headers', {}))
+        headers['Authorization'] = f'Bearer {token}'
+        response = rate_limited_request('spotify', lambda: get_http_session().get(url, headers=headers, **kwargs))
+
+        if response.status_code == 401:
+            print("Spotify rejected the access token, refreshing it...")
+            self.invalidate(token)
+            headers['Authorization'] = f'Bearer {self.get_token()}'
+            response = rate_limited_request('spotify', lambda: get_http_session().get(url, headers=headers, **kwargs))
+
+        return response
+
+    def refresh(self):
+        access_token, expires_in = request_access_token(self.client_id, self.client_secret)
+        if not access_token:
+            return
+
+        self.access_token = access_token
+        self.expires_at = time.time() + expires_in
+        self.write_cache({
+            'client_id': self.client_id,
+            'access_token': self.access_token,
+            'expires_at': self.expires_at,
+        })
+        print(f"Minted a new Spotify access token (valid for {expires_in} seconds).")
+
+    def load_cache(self):
+        cached = self.read_cache()
+        if cached.get('client_id') == self.client_id and cached.get('access_token'):
+            self.access_token = cached['access_token']
+            self.expires_at = cached.get('expires_at', 0)
+
+    def read_cache(self):
+        try:
+            with open(self.cache_path, "r") as cache_file:
+                return json.load(cache_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def write_cache(self, data):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, "w") as cache_file:
+            json.dump(data, cache_file)
+        os.replace(temp_path, self.cache_path)
@@ -0,0 +1,188 @@
+import re
+import json
+import yt_dlp
+from spotify_album_resolver import normalize_text, similarity
+
+# Words that mark a different recording than the studio track, unless the Spotify title has them too
+variant_words = ["live", "cover", "remix", "karaoke", "instrumental", "sped up", "slowed", "nightcore", "8d", "acoustic"]
+
+# Decorations uploaders add to music video titles
+title_noise = re.compile(
+    r'[\(\[][^\)\]]*(official|video|audio|lyric|visuali[sz]er|hd|4k|mv)[^\)\]]*[\)\]]',
+    re.IGNORECASE
+)
+
+
+def parse_spotify_track_id(url):
+    match = re.search(r'track[/:]([A-Za-z0-9]{22})', url or "")
+    return match.group(1) if match else None
+
+
+def ytdlp_search(query, count):
+    """Flat yt-dlp search: one request for `count` results, without opening each video."""
+    ydl_opts = {'quiet': True, 'skip_download': True, 'extract_flat': 'in_playlist'}
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        result = ydl.extract_info(f"ytsearch{count}:{query}", download=False)
+    return [entry for entry in result.get('entries') or [] if entry]
+
+
+def recorded_search(fixture_path):
+    """A search function replaying results saved by record_search, for running the resolver offline."""
+    with open(fixture_path, "r", encoding="utf-8") as fixture_file:
+        recorded = json.load(fixture_file)
+    return lambda query, count: recorded.get(query, [])[:count]
+
+
+def record_search(search, fixture_path):
+    """Wraps a search function so every query and its results are saved to fixture_path."""
+    recorded = {}
+
+    def search_and_record(query, count):
+        results = search(query, count)
+        recorded[query] = results
+        with open(fixture_path, "w", encoding="utf-8") as fixture_file:
+            json.dump(recorded, fixture_file, indent=2)
+        return results
+
+    return search_and_record
+
+
+def clean_video_title(title, artist):
+    title = title_noise.sub('', title or "")
+    # "Artist - Title" uploads: drop the artist part
+    parts = re.split(r'\s[-–]\s', title, maxsplit=1)
+    if len(parts) == 2 and similarity(parts[0], artist) > 0.6:
+        title = parts[1]
+    return title
+
+
+def variant_text(text):
+    """Lowercased words of a title, keeping the "remix"/"live" style words normalize_text strips."""
+    return " ".join(re.sub(r'[^\w\s]', ' ', str(text or "").lower()).split())
+
+
+def channel_name(entry):
+    return entry.get('channel') or entry.get('uploader') or ""
+
+
+def duration_score(spotify_seconds, video_seconds):
+    if not spotify_seconds or not video_seconds:
+        return 0.5  # Unknown: neither reward nor punish
+    delta = abs(spotify_seconds - float(video_seconds))
+    if delta <= 2:
+        return 1.0
+    return max(0.0, 1 - (delta - 2) / 18)  # Down to 0 at 20 seconds off
+
+
+def channel_score(entry, artist):
+    channel = channel_name(entry)
+    if channel.endswith(" - Topic"):
+        return 1.0  # Auto-generated art tracks are the studio recording
+    if similarity(re.sub(r'vevo$', '', channel, flags=re.IGNORECASE), artist) > 0.8 or entry.get('channel_is_verified'):
+        return 0.7  # The artist's own channel
+    return 0.0
+
+
+def score_candidate(entry, spotify_track):
+    """Confidence between 0 and 1 that the search result is the Spotify track."""
+    title = spotify_track['title']
+    artist = spotify_track['artist']
+    video_title = clean_video_title(entry.get('title'), artist)
+
+    title_score = similarity(video_title, title)
+    artist_score = max(
+        similarity(channel_name(entry).replace(" - Topic", ""), artist),
+        1.0 if normalize_text(artist) in normalize_text(entry.get('title')) else 0.0
+    )
+
+    confidence = (
+        0.4 * title_score
+        + 0.2 * artist_score
+        + 0.3 * duration_score(spotify_track['duration'], entry.get('duration'))
+        + 0.1 * channel_score(entry, artist)
+    )
+
+    spotify_words = f" {variant_text(title)} "
+    video_words = f" {variant_text(entry.get('title'))} "
+    for word in variant_words:
+        if f" {word} " in video_words and f" {word} " not in spotify_words:
+            confidence -= 0.3
+
+    return max(0.0, min(1.0, confidence))
+
+
+class SpotifyYouTubeResolver:
+    """
+    Finds the YouTube video for a Spotify track without a browser.
+
+    The track's title, artist and duration come from the Spotify Web API;
+    the candidates from a flat yt-dlp search. Each candidate is scored on
+    title and artist similarity, duration difference and channel type, and
+    the best one is returned with its confidence. `search` is any function
+    (query, count) -> list of yt-dlp entries, so recorded results can be
+    replayed offline with recorded_search().
+    """
+
+    def __init__(self, token_provider, search=ytdlp_search, candidates=10, min_confidence=0.6):
+        self.token_provider = token_provider
+        self.search = search
+        self.candidates = candidates
+        self.min_confidence = min_confidence
+
+    def spotify_track(self, track_id):
+        """
+        The track's details from the Spotify Web API, or None if Spotify doesn't know the track.
+        Raises RuntimeError for any other error (e.g. a 429 or 5xx that outlasted the retries),
+        since that says nothing about whether the track exists.
+        """
+        response = self.token_provider.get(f'https://api.spotify.com/v1/tracks/{track_id}')
+        if response.status_code == 404:
+            print(f"❌ Spotify has no track {track_id}")
+            return None
+        if response.status_code != 200:
+            raise RuntimeError(f"Spotify track lookup failed: {response.status_code}")
+
+        track = response.json()
+        return {
+            "id": track['id'],
+            "title": track['name'],
+            "artist": track['artists'][0]['name'] if track.get('artists') else "",
+            "album": track.get('album', {}).get('name', ""),
+            "duration": track.get('duration_ms', 0) / 1000,
+            "isrc": track.get('external_ids', {}).get('isrc'),
+        }
+
+    def rank(self, spotify_track):
+        """All search results for the track, best first, as (confidence, entry) pairs."""
+        query = f"{spotify_track['artist']} - {spotify_track['title']}"
+        entries = self.search(query, self.candidates)
+        scored = [(score_candidate(entry, spotify_track), entry) for entry in entries if entry.get('id')]
+        return sorted(scored, key=lambda pair: pair[0], reverse=True)
+
+    def resolve_track(self, spotify_track):
+        ranked = self.rank(spotify_track)
+        if not ranked:
+            print(f"❌ No YouTube results for {spotify_track['artist']} - {spotify_track['title']}")
+            return None
+
+        confidence, entry = ranked[0]
+        return {
+            "youtube_link": f"https://www.youtube.com/watch?v={entry['id']}",
+            "video_id": entry['id'],
+            "title": entry.get('title'),
+            "channel": channel_name(entry),
+            "confidence": confidence,
+            "spotify": spotify_track,
+        }
+
+    def resolve(self, spotify_url):
+        """Returns the best match for a Spotify track URL (see resolve_track), or None. See spotify_track for errors."""
+        track_id = parse_spotify_track_id(spotify_url)
+        if not track_id:
+            print(f"❌ Not a Spotify track URL: {spotify_url}")
+            return None
+
+        spotify_track = self.spotify_track(track_id)
+        if not spotify_track:
+            return None
+        return self.resolve_track(spotify_track)
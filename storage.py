@@ -0,0 +1,66 @@
+import os
+import sys
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Determine the correct base directory
+if getattr(sys, 'frozen', False):  # Running as a PyInstaller executable
+    BASE_DIR = sys._MEIPASS
+else:  # Running as a normal script
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+config_path = os.path.join(BASE_DIR, "config.json")
+
+
+def app_data_dir():
+    """
+    Where the app keeps what must outlive a run. A one-file frozen build unpacks
+    to a new sys._MEIPASS temp folder every time it starts, so it uses the
+    user's app-data folder instead; running from source keeps using BASE_DIR.
+    """
+    if getattr(sys, 'frozen', False):
+        app_data = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        return os.path.join(app_data, "Music Fetcher")
+    return BASE_DIR
+
+
+def cache_dir():
+    """The folder every cache, index and journal lives in."""
+    return os.path.join(app_data_dir(), "cache")
+
+
+@contextmanager
+def connect_sqlite(path, row_factory=None, synchronous=None):
+    """
+    Opens the SQLite database at path in WAL mode for the length of a with block.
+    Commits if the block succeeds, rolls back if it raises, and always closes the connection.
+    """
+    conn = sqlite3.connect(path, timeout=30)
+    if row_factory:
+        conn.row_factory = row_factory
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        if synchronous:
+            conn.execute(f"PRAGMA synchronous={synchronous}")
+        with conn:  # Commits on success, rolls back on error
+            yield conn
+    finally:
+        conn.close()
+
+
+def shared_instance(factory):
+    """
+    Returns a get_x() function handing out one shared factory() result,
+    created on first use by whichever thread asks first.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    def get():
+        with lock:
+            if not instance:
+                instance.append(factory())
+            return instance[0]
+
+    return get
@@ -0,0 +1,51 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip("yt_dlp")
+from spotify_youtube_resolver import SpotifyYouTubeResolver, recorded_search, score_candidate
+
+fixture_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "spotify_youtube_search.json")
+
+blinding_lights = {"title": "Blinding Lights", "artist": "The Weeknd", "duration": 200.04}
+get_lucky = {"title": "Get Lucky (Radio Edit)", "artist": "Daft Punk", "duration": 248.4}
+
+
+@pytest.fixture
+def resolver():
+    return SpotifyYouTubeResolver(token_provider=None, search=recorded_search(fixture_path))
+
+
+def test_picks_the_studio_recording_over_remix_and_live_decoys(resolver):
+    match = resolver.resolve_track(blinding_lights)
+    assert match["video_id"] == "J7p4bzqLvCw"
+    assert match["channel"] == "The Weeknd - Topic"
+    assert match["confidence"] == pytest.approx(1.0)
+
+
+def test_ranks_decoys_below_the_minimum_or_the_official_uploads(resolver):
+    ranked = {entry["id"]: confidence for confidence, entry in resolver.rank(blinding_lights)}
+    assert ranked["4NRXx6U8ABQ"] > ranked["rMx5hXbJ3UA"]  # Official video beats the remix
+    assert ranked["k2qgadSvNyU"] < resolver.min_confidence  # Live
+    assert ranked["Xk1x2c3v4bA"] < resolver.min_confidence  # Cover
+
+
+def test_penalises_variant_words_in_artist_dash_title_uploads():
+    remix = {"title": "The Weeknd - Blinding Lights (Remix)", "channel": "The Weeknd", "duration": 201}
+    plain = dict(remix, title="The Weeknd - Blinding Lights")
+    assert score_candidate(plain, blinding_lights) - score_candidate(remix, blinding_lights) >= 0.3
+
+
+def test_keeps_variant_words_the_spotify_title_has(resolver):
+    match = resolver.resolve_track(get_lucky)
+    assert match["video_id"] == "h5EofwRzit0"
+    assert match["confidence"] == pytest.approx(1.0)
+
+    ranked = {entry["id"]: confidence for confidence, entry in resolver.rank(get_lucky)}
+    assert ranked["Qm2fX0Ykq8c"] == 0.0  # Live karaoke remix
+
+
+def test_no_recorded_results(resolver):
+    assert resolver.resolve_track({"title": "Nothing", "artist": "Nobody", "duration": 100}) is None
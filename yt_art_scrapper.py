@@ -1,22 +1,64 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
+from io import BytesIO
+from PIL import Image
+from driver_pool import get_driver_pool
 
-def setup_chrome_driver():
-    """Set up the Chrome WebDriver with headless options."""
-    options = Options()
-    #options.add_argument('--headless')  # Use headless mode for Chrome (modern headless setting)
-    options.add_argument('--disable-gpu')  # Ensure GPU is disabled in headless mode
-    options.add_argument('--window-size=5x5')  # Set window size for screenshots and rendering
+# Thumbnails whose sides differ by at most this fraction count as square
+square_tolerance = 0.02
 
-    # Set up the driver with ChromeDriverManager to automatically manage the driver version
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    return driver
+def is_square(thumbnail):
+    width, height = thumbnail.get('width'), thumbnail.get('height')
+    return bool(width and height) and abs(width - height) <= square_tolerance * max(width, height)
+
+def thumbnail_rank(thumbnail):
+    # Biggest first; prefer JPEG/PNG over WebP, which many tag readers can't show
+    is_webp = 'webp' in thumbnail.get('url', '')
+    return (not is_webp, (thumbnail.get('width') or 0) * (thumbnail.get('height') or 0), thumbnail.get('preference') or 0)
+
+def crop_to_square(data):
+    """Centre-crops an image to a square and returns it as JPEG bytes."""
+    with Image.open(BytesIO(data)) as image:
+        width, height = image.size
+        side = min(width, height)
+        left, top = (width - side) // 2, (height - side) // 2
+        square = image.crop((left, top, left + side, top + side)).convert("RGB")
+
+        output = BytesIO()
+        square.save(output, format="JPEG", quality=95)
+        return output.getvalue()
+
+def pick_thumbnail_url(info_dict, crop=True):
+    """
+    Picks album art from the thumbnails yt-dlp already extracted.
+    Returns (url, needs_crop): the largest square thumbnail, or with crop the
+    largest other one, to be centre-cropped to a square; (None, False) if there are none.
+    """
+    thumbnails = [thumbnail for thumbnail in (info_dict or {}).get('thumbnails') or [] if thumbnail.get('url')]
+
+    square = [thumbnail for thumbnail in thumbnails if is_square(thumbnail)]
+    if square:
+        return max(square, key=thumbnail_rank)['url'], False
+
+    if crop and thumbnails:
+        return max(thumbnails, key=thumbnail_rank)['url'], True
+
+    return None, False
+
+def resolve_album_art(info_dict, url, crop=True):
+    """
+    Album art for a YouTube track: from its info dict when possible, otherwise scraped from the page.
+    Returns (album_art_url, needs_crop); crop_to_square() the image before embedding it if needs_crop.
+    """
+    album_art_url, needs_crop = pick_thumbnail_url(info_dict, crop)
+    if album_art_url:
+        print("✅ Album Art URL (from thumbnails):", album_art_url)
+        return album_art_url, needs_crop
+
+    print("No usable thumbnail in the track info, scraping the page for album art...")
+    return art_scrapper_main(url), False
 
 def get_album_art_url(driver, ytmusic_url):
     """Extract the album art URL from a YouTube Music URL."""
@@ -38,20 +80,16 @@ def get_album_art_url(driver, ytmusic_url):
         return None
 
 def art_scrapper_main(url):
-    driver = setup_chrome_driver()
-    
-    try:
+    # The browser goes back to the shared pool instead of being closed
+    with get_driver_pool().checkout() as driver:
         print("🚀 Opening URL:", url)  # Debugging log
         album_art_url = get_album_art_url(driver, url)
-        
+
         if album_art_url:
             print("✅ Album Art URL:", album_art_url)
             return album_art_url
         else:
             print("❌ Failed to extract album art.")
-    finally:
-        print("🧹 Closing browser.")
-        driver.quit()
 
 # if __name__ == "__main__":
 #     art_scrapper_main("https://music.youtube.com/watch?v=uS0h--cafLo&si=4j4qWL4JNDF38w7v")